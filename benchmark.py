@@ -0,0 +1,650 @@
+"""
+Benchmarks for the Legal Document Drafting Agent
+Run with: python benchmark.py [name ...]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from statistics import mean
+from typing import Any, List, Optional
+
+os.environ.setdefault("OPENROUTER_API_KEY", "sk-or-benchmark-placeholder")
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from graph import LegalDocumentAgent, AgentState, PRIMARY_MODEL, FALLBACK_MODEL
+from llm_cache import ResponseCache
+
+NDA_INFO = {
+    "disclosing_party": "Alice",
+    "receiving_party": "Bob",
+    "purpose": "Discussing a business idea",
+    "duration": "2 years",
+    "jurisdiction": "California"
+}
+
+
+class LatencyChatModel(BaseChatModel):
+    """Offline stand-in for an OpenRouter model that answers after a fixed delay."""
+    latency: float = 0.2
+    # With probability tail_probability a call takes tail_latency instead
+    tail_latency: float = 0.0
+    tail_probability: float = 0.0
+    response: str = "NON-DISCLOSURE AGREEMENT\n\nDrafted offline for benchmarking."
+    # "length" makes every answer look cut off by max_tokens
+    finish_reason: str = "stop"
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency-fake"
+
+    def _delay(self) -> float:
+        return self.tail_latency if random.random() < self.tail_probability else self.latency
+
+    def _result(self) -> ChatResult:
+        self.calls += 1
+        message = AIMessage(content=self.response, response_metadata={"finish_reason": self.finish_reason})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result()
+
+
+def make_offline_agent(latency: float = 0.2) -> LegalDocumentAgent:
+    """
+    Agent whose models are replaced by LatencyChatModel so no network is used.
+    Its response cache holds nothing, so every call pays the simulated latency.
+    """
+    agent = LegalDocumentAgent(cache=ResponseCache(storage_dir=None, max_size=0))
+    agent._llms[PRIMARY_MODEL] = LatencyChatModel(latency=latency)
+    agent._llms[FALLBACK_MODEL] = LatencyChatModel(latency=latency)
+    return agent
+
+
+def nda_state(session_id: str) -> dict:
+    state = AgentState(session_id=session_id, document_type="nda", collected_info=dict(NDA_INFO), is_complete=True)
+    return state.model_dump()
+
+
+def bench_startup(runs: int = 20) -> None:
+    """Time from constructing an agent to having the first question ready."""
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        agent = LegalDocumentAgent()
+        state = AgentState(session_id=f"bench-{i}", user_input="Draft an NDA between Alice and Bob")
+        state_dict = agent.identify_document_type(state.model_dump())
+        state_dict = agent.ask_question(state_dict)
+        assert state_dict["current_question"]
+        timings.append(time.perf_counter() - start)
+    print(f"startup: time-to-first-question mean={mean(timings) * 1000:.2f}ms "
+          f"max={max(timings) * 1000:.2f}ms over {runs} runs (no network calls)")
+
+
+def bench_async_throughput(sessions: int = 200, latency: float = 0.2) -> None:
+    """Documents per second: sequential sync calls vs. one event loop with asyncio.gather."""
+    agent = make_offline_agent(latency)
+
+    sync_runs = 10
+    start = time.perf_counter()
+    for i in range(sync_runs):
+        agent.generate_document(nda_state(f"sync-{i}"))
+    sync_rate = sync_runs / (time.perf_counter() - start)
+
+    async def run_all():
+        return await asyncio.gather(*(agent.agenerate_document(nda_state(f"async-{i}")) for i in range(sessions)))
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    async_rate = len(results) / (time.perf_counter() - start)
+    print(f"async: sync={sync_rate:.1f} docs/s, async={async_rate:.1f} docs/s "
+          f"({sessions} concurrent sessions, {latency * 1000:.0f}ms simulated LLM latency)")
+
+
+def bench_chain_registry(calls: int = 2000) -> None:
+    """Per-call cost of building prompt | llm | parser vs. looking it up in the ChainRegistry."""
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+    from prompt_templates import DOCUMENT_GENERATION_PROMPT
+
+    agent = make_offline_agent(latency=0)
+    llm = agent.get_llm(PRIMARY_MODEL)
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        ChatPromptTemplate.from_template(DOCUMENT_GENERATION_PROMPT) | llm | StrOutputParser()
+    rebuild = (time.perf_counter() - start) / calls
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        agent.chains.get(DOCUMENT_GENERATION_PROMPT, PRIMARY_MODEL, llm)
+    cached = (time.perf_counter() - start) / calls
+    print(f"chains: rebuild={rebuild * 1e6:.1f}us/call, registry={cached * 1e6:.2f}us/call "
+          f"({rebuild / cached:.0f}x less overhead)")
+
+
+def bench_hedging(calls: int = 60) -> None:
+    """p50/p99 latency with a heavy-tailed primary, sequential fallback vs. hedged requests."""
+    from resilience import HedgingPolicy
+
+    def run(agent: LegalDocumentAgent) -> List[float]:
+        timings = []
+        for i in range(calls):
+            start = time.perf_counter()
+            agent.get_llm_response("Draft clause {n}", {"n": i}, use_cache=False)
+            timings.append(time.perf_counter() - start)
+        return sorted(timings)
+
+    random.seed(7)
+    results = {}
+    for label, hedging in (("sequential", None), ("hedged", HedgingPolicy(percentile=90, min_samples=10, default_delay=0.3))):
+        agent = make_offline_agent()
+        agent.hedging = hedging
+        agent._llms[PRIMARY_MODEL] = LatencyChatModel(latency=0.05, tail_latency=1.0, tail_probability=0.1)
+        agent._llms[FALLBACK_MODEL] = LatencyChatModel(latency=0.08)
+        results[label] = run(agent)
+        if hedging:
+            print(f"hedging: {hedging.stats()}")
+    for label, timings in results.items():
+        print(f"hedging: {label} p50={timings[len(timings) // 2] * 1000:.0f}ms "
+              f"p99={timings[int(len(timings) * 0.99) - 1] * 1000:.0f}ms")
+
+
+def bench_batch(documents: int = 64, latency: float = 0.2) -> None:
+    """Throughput of generate_documents as max_concurrency grows."""
+    agent = make_offline_agent(latency)
+    states = [nda_state(f"batch-{i}") for i in range(documents)]
+    for concurrency in (1, 4, 16, 64):
+        start = time.perf_counter()
+        results = agent.generate_documents(states, max_concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for r in results if r.get("error_message"))
+        print(f"batch: max_concurrency={concurrency:<3} {documents / elapsed:7.1f} docs/s ({errors} errors)")
+
+
+def bench_templates(renders: int = 20000) -> None:
+    """Renders per second: str.format on the raw template vs. the compiled segment list."""
+    from prompt_templates import NDA_TEMPLATE, get_compiled_template
+
+    values = dict(NDA_INFO, date="January 1, 2026", disclosing_party_address_formatted="",
+                  receiving_party_address_formatted="", specific_exclusions_formatted="")
+    batch = [dict(values, receiving_party=f"Party {i}") for i in range(renders)]
+    compiled = get_compiled_template("nda")
+    assert compiled.render(values) == NDA_TEMPLATE.format(**values)
+
+    start = time.perf_counter()
+    for item in batch:
+        NDA_TEMPLATE.format(**item)
+    format_rate = renders / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    compiled.render_many(batch)
+    compiled_rate = renders / (time.perf_counter() - start)
+    print(f"templates: str.format={format_rate:,.0f} renders/s, compiled={compiled_rate:,.0f} renders/s")
+
+
+def bench_sections(latency: float = 0.2) -> None:
+    """
+    Wall-clock time for one long NDA: a single call whose latency grows with the
+    whole document vs. numbered sections drafted in parallel, with and without
+    every section hitting the token limit once.
+    """
+    from graph import MAX_CONTINUATIONS
+    from prompt_templates import get_compiled_template
+    from sections import plan_sections
+
+    numbered = sum(1 for section in plan_sections(get_compiled_template("nda")) if section.is_numbered)
+    agent = make_offline_agent(latency * numbered)
+    start = time.perf_counter()
+    agent.generate_document(nda_state("single-call"))
+    print(f"sections: single call       {time.perf_counter() - start:6.2f}s")
+
+    agent = make_offline_agent(latency)
+    agent.generation_mode = "sections"
+    start = time.perf_counter()
+    result = agent.generate_document(nda_state("sections"))
+    print(f"sections: {numbered} parallel sections {time.perf_counter() - start:6.2f}s ({result['final_document'].count('Drafted offline')} drafted)")
+
+    for model in (PRIMARY_MODEL, FALLBACK_MODEL):
+        agent._llms[model].finish_reason = "length"
+    start = time.perf_counter()
+    agent.generate_document(nda_state("truncated"))
+    print(f"sections: always truncated  {time.perf_counter() - start:6.2f}s ({MAX_CONTINUATIONS} continuations per section)")
+
+
+def bench_edits(latency: float = 0.2) -> None:
+    """Time and LLM calls for changing one answer: full regeneration vs. patching the affected sections."""
+    from copy import deepcopy
+
+    for mode in ("template", "sections"):
+        agent = make_offline_agent(latency)
+        agent.generation_mode = mode
+        drafted = agent.generate_document(nda_state(f"edit-{mode}"))
+
+        model = agent._llms[PRIMARY_MODEL]
+
+        state = deepcopy(drafted)
+        state["collected_info"]["jurisdiction"] = "Texas"
+        model.calls = 0
+        start = time.perf_counter()
+        agent.generate_document(state)
+        full, full_calls = time.perf_counter() - start, model.calls
+
+        state = deepcopy(drafted)
+        model.calls = 0
+        start = time.perf_counter()
+        agent.update_answer(state, "jurisdiction", "Texas")
+        patched, patched_calls = time.perf_counter() - start, model.calls
+        print(f"edits: {mode:<8} full={full * 1000:7.1f}ms ({full_calls} LLM calls) "
+              f"patched={patched * 1000:7.1f}ms ({patched_calls} LLM calls)")
+
+
+def bench_speculative(latency: float = 0.3, think_time: float = 0.2) -> None:
+    """Wait after the last answer, with and without a draft started once the required fields were known."""
+    from prompt_templates import get_questions_for_document
+
+    answers = dict(NDA_INFO, disclosing_party_address="1 Main St", receiving_party_address="2 Oak Ave", specific_exclusions="None")
+    for mode in ("hybrid", "sections"):
+        for speculate in (False, True):
+            agent = make_offline_agent(latency)
+            agent.generation_mode = mode
+            agent.speculative_drafting = speculate
+            state = agent.ask_question(nda_state(f"speculative-{mode}-{speculate}") | {"collected_info": {}, "is_complete": False})
+            while not state["is_complete"]:
+                field = next(f for f in get_questions_for_document("nda") if f not in state["collected_info"])
+                state["user_input"] = answers[field]
+                state = agent.process_answer(state)
+                if not state["is_complete"]:
+                    state = agent.ask_question(state)
+                    # The user reads the next question and types an answer
+                    time.sleep(think_time)
+            model = agent._llms[PRIMARY_MODEL]
+            calls = model.calls
+            start = time.perf_counter()
+            agent.generate_document(state)
+            print(f"speculative: {mode:<8} speculate={speculate!s:<5} wait={(time.perf_counter() - start) * 1000:6.0f}ms "
+                  f"({model.calls - calls} LLM calls after the last answer)")
+
+
+def bench_questionnaire(fields: int = 500) -> None:
+    """Time for a whole questionnaire: substring scan and missing-list rebuild per turn vs. the compiled bitmask plan."""
+    from questionnaire import Questionnaire
+
+    questions = {f"field_{i}": {"question": f"What is the value of field number {i}?", "required": i % 2 == 0} for i in range(fields)}
+
+    start = time.perf_counter()
+    collected_info = {}
+    while True:
+        missing = [f for f in questions if f not in collected_info]
+        if not missing:
+            break
+        current_question = questions[missing[0]]["question"]
+        for field, config in questions.items():
+            if config["question"] in current_question:
+                collected_info[field] = "answer"
+                break
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    questionnaire = Questionnaire("benchmark", questions)
+    collected_info, mask = {}, 0
+    while True:
+        field, mask = questionnaire.next_field(mask, collected_info)
+        if field is None:
+            break
+        collected_info[field] = "answer"
+        mask |= questionnaire.bits[field]
+    compiled = time.perf_counter() - start
+    print(f"questionnaire: {fields} fields scan={scan * 1000:.1f}ms compiled={compiled * 1000:.1f}ms (compile included)")
+
+
+def bench_classifier(document_types: int = 300, requests: int = 2000) -> None:
+    """Classification time per request with hundreds of registered document types."""
+    from classifier import DocumentTypeClassifier
+    from prompt_templates import get_document_type_aliases
+
+    aliases = get_document_type_aliases()
+    for i in range(document_types):
+        aliases[f"type_{i}"] = [f"custom agreement {i}", f"form {i} filing", f"schedule {i} notice"]
+    classifier = DocumentTypeClassifier(aliases)
+    inputs = ["I need an NDA for my startup", "please draft a rental agreemnt", "servce agreement for a freelancer",
+              "I want to rent out my property", "custom agreement 42 please"]
+    for text in inputs:
+        start = time.perf_counter()
+        for _ in range(requests // len(inputs)):
+            result = classifier.classify(text)
+        per_call = (time.perf_counter() - start) / (requests // len(inputs))
+        print(f"classifier: {len(aliases)} types {per_call * 1e6:7.1f}us {result.method:<5} "
+              f"{result.document_type} ({result.confidence:.2f}) <- {text!r}")
+
+
+def bench_registry(lookups: int = 100000) -> None:
+    """Cold load of the YAML document types, a no-op refresh, and warm lookups by type and alias."""
+    from document_registry import DocumentRegistry
+
+    registry = DocumentRegistry()
+    start = time.perf_counter()
+    registry.get("nda")
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registry.refresh()
+    refresh = time.perf_counter() - start
+
+    names = ["nda", "contract", "lease", "rental agreement", "service agreement"]
+    start = time.perf_counter()
+    for i in range(lookups):
+        registry.get(names[i % len(names)])
+    warm = (time.perf_counter() - start) / lookups
+    print(f"registry: cold load={cold * 1000:.1f}ms refresh (unchanged)={refresh * 1000:.2f}ms lookup={warm * 1e9:.0f}ns")
+
+
+# Each scripted answer covers only its own question, so every field skipped was filled from the request or by
+# extraction from an answer a user would plausibly give
+EXTRACTION_SCRIPTS = [
+    ("Draft an NDA between Alice Corp and Bob Smith for 2 years under California law",
+     dict(NDA_INFO, disclosing_party_address="1 Main St", receiving_party_address="2 Oak Ave", specific_exclusions="None")),
+    ("I need a rental agreement. The landlord is John Smith and the tenant is Jane Doe.",
+     {"landlord": "John Smith", "tenant": "Jane Doe", "property_address": "5 Elm St",
+      "monthly_rent": "$1,500", "lease_term": "12 months",
+      "security_deposit": "$3,000", "start_date": "January 1, 2025"}),
+    ("Service agreement between ABC Company and XYZ Corporation",
+     {"party_1": "ABC Company", "party_2": "XYZ Corporation", "contract_type": "Service Agreement",
+      "services_or_goods": "Web development", "payment_terms": "$5,000 upon completion",
+      "duration": "6 months", "jurisdiction": "Texas"}),
+]
+
+# Jurisdiction phrasings and the value each should pre-fill, or None when the question must still be asked
+JURISDICTION_CASES = [
+    ("Under New York law", "New York"),
+    ("governed by the laws of the State of Delaware", "Delaware"),
+    ("Jurisdiction: Texas", "Texas"),
+    ("our Delaware courts case", None),
+    ("we found a Tax law firm", None),
+]
+
+
+def bench_extraction() -> None:
+    """Questions asked per document for scripted conversations, with and without local answer extraction."""
+    from extraction import PREFILL_THRESHOLD, get_answer_extractor
+
+    for text, expected in JURISDICTION_CASES:
+        extraction = get_answer_extractor("nda").extract(text).get("jurisdiction")
+        prefilled = extraction.value if extraction and extraction.confidence >= PREFILL_THRESHOLD else None
+        assert prefilled == expected, f"{text!r}: pre-filled {prefilled!r}, expected {expected!r}"
+
+    for request, answers in EXTRACTION_SCRIPTS:
+        turns = {}
+        for extract in (False, True):
+            agent = make_offline_agent(0.0)
+            agent.extract_answers = extract
+            state = AgentState(session_id=f"extraction-{extract}", user_input=request).model_dump()
+            state = agent.ask_question(agent.identify_document_type(state))
+            asked = 0
+            while not state["is_complete"]:
+                asked += 1
+                state["user_input"] = answers[state["current_field"]]
+                state = agent.process_answer(state)
+                if not state["is_complete"]:
+                    state = agent.ask_question(state)
+            turns[extract] = (asked, len(state.get("extracted_fields", {})))
+        extractor = get_answer_extractor(state["document_type"])
+        start = time.perf_counter()
+        for _ in range(1000):
+            extractor.extract(request)
+        per_call = (time.perf_counter() - start) / 1000
+        print(f"extraction: {state['document_type']:<8} questions asked before={turns[False][0]} after={turns[True][0]} "
+              f"({turns[True][1]} fields pre-filled, {per_call * 1e6:.0f}us per message)")
+
+
+def bench_session_io(sessions: int = 50, turns: int = 12) -> None:
+    """File reads and writes per turn (get_session then update_session) for the old per-call I/O, write-through and write-back."""
+    import json
+    import tempfile
+    from memory import SessionMemoryManager
+
+    def legacy_turn(path, counts: dict, answer: dict) -> None:
+        # The old manager: get_session read and rewrote the file, update_session did that again and saved once more
+        for _ in range(2):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            counts["reads"] += 1
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            counts["writes"] += 1
+        data["conversation_history"].append(answer)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        counts["writes"] += 1
+
+    answer = {"question": "Who is the Disclosing Party?", "answer": "Alice"}
+    with tempfile.TemporaryDirectory() as storage_dir:
+        counts = {"reads": 0, "writes": 0}
+        setup = SessionMemoryManager(storage_dir, flush_interval=None)
+        start = time.perf_counter()
+        for i in range(sessions):
+            setup.store.save(f"legacy-{i}", setup.create_session(f"legacy-{i}"))
+            for _ in range(turns):
+                legacy_turn(setup.store.path_for(f"legacy-{i}"), counts, answer)
+        elapsed = time.perf_counter() - start
+        print(f"session io: {'legacy':<13} reads/turn={counts['reads'] / (sessions * turns):.2f} "
+              f"writes/turn={counts['writes'] / (sessions * turns):.2f} total={elapsed * 1000:6.0f}ms")
+
+        for label, flush_interval in (("write-through", None), ("write-back", 3600.0)):
+            manager = SessionMemoryManager(storage_dir, flush_interval=flush_interval)
+            start = time.perf_counter()
+            for i in range(sessions):
+                for _ in range(turns):
+                    session = manager.get_session(f"{label}-{i}")
+                    manager.update_session(f"{label}-{i}", {"conversation_history": session["conversation_history"] + [answer]})
+            manager.close()
+            elapsed = time.perf_counter() - start
+            stats = manager.stats()
+            print(f"session io: {label:<13} reads/turn={stats['store_reads'] / (sessions * turns):.2f} "
+                  f"writes/turn={stats['store_writes'] / (sessions * turns):.2f} total={elapsed * 1000:6.0f}ms")
+
+
+def check_store_parity(tmp: str, sessions: int = 60) -> int:
+    """
+    Assert that the JSON and SQLite stores answer the same queries alike, for
+    sessions migrated in small batches out of last_updated order (with ties)
+    and again after the JSON index is reloaded from disk. Returns how many
+    queries were compared.
+    """
+    from migrate_sessions import migrate_sessions
+    from session_store import JsonSessionStore, SqliteSessionStore
+
+    sqlite = SqliteSessionStore(f"{tmp}/parity.db")
+    sqlite.save_many({f"s{i}": {
+        "session_id": f"s{i}", "document_type": ("nda", "contract", "lease")[i % 3], "is_complete": i % 4 == 0,
+        "created_at": "2025-01-01T00:00:00", "last_updated": f"2025-{1 + (i * 7) % 12:02d}-{1 + i % 5:02d}T00:00:00"
+    } for i in range(sessions)})
+    json_store = JsonSessionStore(f"{tmp}/parity")
+    migrate_sessions(sqlite, json_store, batch_size=3)
+    queries = [
+        {"limit": 3}, {"limit": 10, "offset": 5}, {}, {"updated_after": "2025-06-01"},
+        {"updated_before": "2025-03-01"}, {"updated_after": "2025-02-03T00:00:00", "updated_before": "2025-09-01"},
+        {"document_type": "lease", "limit": 5}, {"is_complete": True, "updated_after": "2025-04-01"},
+        {"document_type": "nda", "is_complete": False, "offset": 2, "limit": 4}
+    ]
+    for store in (json_store, JsonSessionStore(f"{tmp}/parity")):
+        for query in queries:
+            assert store.query(**query) == sqlite.query(**query), f"{query}: {store.query(**query)} != {sqlite.query(**query)}"
+        store.close()
+    sqlite.close()
+    return len(queries) * 2
+
+
+def bench_session_store(sessions: int = 1_000_000, json_sessions: int = 20_000, lookups: int = 2000) -> None:
+    """Bulk load, point reads and filtered queries for the JSON file store and the SQLite store."""
+    import tempfile
+    from session_store import JsonSessionStore, SqliteSessionStore
+
+    document_types = ("nda", "contract", "lease")
+
+    def session(i: int) -> dict:
+        return {
+            "session_id": f"s{i}", "created_at": f"2025-01-01T00:00:{i % 60:02d}",
+            "last_updated": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00.{i:06d}",
+            "document_type": document_types[i % 3], "collected_info": dict(NDA_INFO),
+            "conversation_history": [{"question": "Who is the Disclosing Party?", "answer": "Alice"}] * 5,
+            "current_question": "", "is_complete": i % 4 == 0, "final_document": ""
+        }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"session store: JSON and SQLite agree on {check_store_parity(tmp)} queries")
+        for store, count in ((JsonSessionStore(f"{tmp}/json"), json_sessions), (SqliteSessionStore(f"{tmp}/sessions.db"), sessions)):
+            name = type(store).__name__
+            start = time.perf_counter()
+            for first in range(0, count, 10_000):
+                store.save_many({f"s{i}": session(i) for i in range(first, min(first + 10_000, count))})
+            load = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for i in range(lookups):
+                store.load(f"s{(i * 7919) % count}")
+            read = (time.perf_counter() - start) / lookups
+
+            start = time.perf_counter()
+            page = store.query(document_type="lease", is_complete=False, limit=50)
+            query = time.perf_counter() - start
+            start = time.perf_counter()
+            completed = store.count(is_complete=True)
+            counted = time.perf_counter() - start
+            print(f"session store: {name:<18} {count:>9} sessions load={load:6.1f}s read={read * 1e6:6.0f}us "
+                  f"query page={query * 1000:8.1f}ms ({len(page)} ids) count={counted * 1000:8.1f}ms ({completed} complete)")
+            store.close()
+
+
+def bench_session_journal(turns: int = 60, document_size: int = 20_000) -> None:
+    """Bytes written per turn early and late in a long session: full rewrite vs. the append-only journal."""
+    import tempfile
+    from memory import SessionMemoryManager
+    from session_store import JsonSessionStore
+
+    for journal in (False, True):
+        with tempfile.TemporaryDirectory() as storage_dir:
+            store = JsonSessionStore(storage_dir, journal=journal)
+            manager = SessionMemoryManager(storage_dir, flush_interval=None, store=store)
+            manager.update_session("journal", {"final_document": "x" * document_size})
+            per_turn = []
+            start = time.perf_counter()
+            for turn in range(turns):
+                written = store.bytes_written
+                session = manager.get_session("journal")
+                answer = {"question": f"Question {turn}?", "answer": f"Answer number {turn}"}
+                manager.update_session("journal", {"conversation_history": session["conversation_history"] + [answer],
+                                                   "current_question": f"Question {turn + 1}?"})
+                per_turn.append(store.bytes_written - written)
+            elapsed = time.perf_counter() - start
+            reloaded = JsonSessionStore(storage_dir).load("journal")
+            assert len(reloaded["conversation_history"]) == turns
+            label = "journal" if journal else "full rewrite"
+            print(f"session journal: {label:<12} bytes/turn first 10={mean(per_turn[:10]):8.0f} last 10={mean(per_turn[-10:]):8.0f} "
+                  f"total={sum(per_turn) / 1024:7.0f}KiB ({store.compactions} snapshots) {elapsed * 1000:5.0f}ms")
+
+
+def bench_session_listing(sessions: int = 100_000) -> None:
+    """Listing sessions by globbing one flat directory vs. paging through the sharded store's index."""
+    import json
+    import tempfile
+    from pathlib import Path
+    from session_store import JsonSessionStore
+
+    document_types = ("nda", "contract", "lease")
+    with tempfile.TemporaryDirectory() as tmp:
+        flat = Path(tmp) / "flat"
+        flat.mkdir()
+        store = JsonSessionStore(Path(tmp) / "sharded")
+        for first in range(0, sessions, 10_000):
+            batch = {
+                f"s{i}": {"session_id": f"s{i}", "document_type": document_types[i % 3], "is_complete": i % 4 == 0,
+                          "created_at": "2025-01-01T00:00:00", "last_updated": f"2025-01-01T00:00:00.{i:06d}"}
+                for i in range(first, min(first + 10_000, sessions))
+            }
+            for session_id, session_data in batch.items():
+                (flat / f"session_{session_id}.json").write_text(json.dumps(session_data))
+            store.save_many(batch)
+
+        start = time.perf_counter()
+        listed = [f.stem.replace("session_", "") for f in flat.glob("session_*.json")]
+        glob_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reopened = JsonSessionStore(Path(tmp) / "sharded")
+        reopened.index
+        open_time = time.perf_counter() - start
+        start = time.perf_counter()
+        page = reopened.query(limit=50, offset=100)
+        page_time = time.perf_counter() - start
+        start = time.perf_counter()
+        leases = reopened.query(document_type="lease", is_complete=False, limit=50)
+        filter_time = time.perf_counter() - start
+        print(f"session listing: {sessions} sessions flat glob={glob_time * 1000:.0f}ms ({len(listed)} ids) | "
+              f"index load={open_time * 1000:.0f}ms page={page_time * 1000:.1f}ms ({len(page)} ids) "
+              f"filtered page={filter_time * 1000:.1f}ms ({len(leases)} ids)")
+
+
+def bench_session_gc(visits: int = 2000, empty_sessions: int = 20_000) -> None:
+    """Files written by sessions that are looked up but never used, and a GC sweep over a store full of empty ones."""
+    import tempfile
+    from memory import SessionMemoryManager
+    from session_store import JsonSessionStore
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = SessionMemoryManager(storage_dir, flush_interval=None)
+        for i in range(visits):
+            manager.get_session(f"visit-{i}")
+        print(f"session gc: {visits} lookups of new sessions stored {manager.store.writes} files")
+
+        store = JsonSessionStore(storage_dir)
+        for first in range(0, empty_sessions, 10_000):
+            store.save_many({
+                f"empty-{i}": {"session_id": f"empty-{i}", "document_type": "", "collected_info": {},
+                               "conversation_history": [], "last_updated": "2025-07-04T21:32:37"}
+                for i in range(first, min(first + 10_000, empty_sessions))
+            })
+        store.save("kept", {"session_id": "kept", "document_type": "nda", "is_complete": True, "last_updated": "2025-07-04T21:32:37"})
+        start = time.perf_counter()
+        report = SessionMemoryManager(storage_dir, flush_interval=None, store=store).collect_garbage()
+        elapsed = time.perf_counter() - start
+        print(f"session gc: removed {len(report['empty'])} empty and {len(report['abandoned'])} abandoned sessions "
+              f"in {elapsed:.1f}s, {len(store.list_ids())} left")
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "async": bench_async_throughput,
+    "chains": bench_chain_registry,
+    "hedging": bench_hedging,
+    "batch": bench_batch,
+    "templates": bench_templates,
+    "sections": bench_sections,
+    "edits": bench_edits,
+    "speculative": bench_speculative,
+    "questionnaire": bench_questionnaire,
+    "classifier": bench_classifier,
+    "registry": bench_registry,
+    "extraction": bench_extraction,
+    "session_io": bench_session_io,
+    "session_store": bench_session_store,
+    "session_journal": bench_session_journal,
+    "session_listing": bench_session_listing,
+    "session_gc": bench_session_gc,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
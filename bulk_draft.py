@@ -0,0 +1,192 @@
+"""
+Bulk Legal Document Drafting
+Non-interactive entry point that drafts a document for every record in a
+JSONL or CSV file. Each record needs a document_type plus the fields from
+prompt_templates.py, either flat or under "collected_info".
+
+Results are appended to the output JSONL as soon as each record finishes,
+each with a status: "ok", "error", or "fallback" when an LLM-backed mode
+fell back to the plain template. The output file doubles as the checkpoint:
+on restart, records whose latest line is "ok" are skipped and the rest are
+drafted again, so a killed run resumes where it stopped and failures are
+retried.
+
+Usage: python bulk_draft.py records.csv documents.jsonl --workers 8
+"""
+
+import argparse
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, Set, Tuple
+
+from graph import LegalDocumentAgent, AgentState, GENERATION_MODES, document_source
+from prompt_templates import get_questions_for_document
+
+META_FIELDS = {"id", "record_id", "document_type", "collected_info"}
+# Set on records that couldn't be read, with the reason
+READ_ERROR = "_read_error"
+
+
+def read_records(path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (record_id, record) pairs; records without an id are numbered by
+    position. A JSONL line that isn't a JSON object is yielded as a record
+    holding only READ_ERROR, so it is reported rather than ending the run.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (parse_line(line) for line in f if line.strip())
+        for index, row in enumerate(rows, start=1):
+            record_id = str(row.get("record_id") or row.get("id") or f"row-{index}")
+            yield record_id, row
+
+
+def parse_line(line: str) -> Dict[str, Any]:
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {READ_ERROR: f"Malformed JSON: {e}"}
+    if not isinstance(row, dict):
+        return {READ_ERROR: f"Expected a JSON object, got {type(row).__name__}"}
+    return row
+
+
+def load_completed_ids(output_path: Path) -> Set[str]:
+    """
+    Ids whose latest line in the output succeeded; a torn last line from a
+    killed run is ignored. Lines written before statuses existed count as
+    done unless they carry an error.
+    """
+    succeeded: Dict[str, bool] = {}
+    if not output_path.exists():
+        return set()
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                record_id = result["record_id"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            status = result.get("status") or ("error" if result.get("error_message") else "ok")
+            succeeded[record_id] = status == "ok"
+    return {record_id for record_id, ok in succeeded.items() if ok}
+
+
+def record_to_state(record_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    document_type = str(record.get("document_type") or "").strip().lower()
+    collected_info = record.get("collected_info")
+    if not isinstance(collected_info, dict):
+        collected_info = {k: v for k, v in record.items() if k not in META_FIELDS}
+    # Empty CSV cells mean "not provided"
+    collected_info = {k: v for k, v in collected_info.items() if v not in (None, "")}
+    state = AgentState(session_id=record_id, document_type=document_type, collected_info=collected_info, is_complete=True)
+    return state.model_dump()
+
+
+def record_status(agent: LegalDocumentAgent, state: Dict[str, Any], error_message: str, final_document: str) -> str:
+    if error_message or not final_document:
+        return "error"
+    if document_source(final_document) == "template" and agent.uses_llm(state):
+        return "fallback"
+    return "ok"
+
+
+def error_result(record_id: str, document_type: Any, error_message: str, seconds: float = 0.0) -> Dict[str, Any]:
+    return {"record_id": record_id, "document_type": str(document_type or ""), "status": "error",
+            "final_document": "", "error_message": error_message, "seconds": round(seconds, 3)}
+
+
+def draft_record(agent: LegalDocumentAgent, record_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Draft one record. Never raises: any failure becomes a status "error" result."""
+    start = time.perf_counter()
+    try:
+        return generate_record(agent, record_id, record, start)
+    except Exception as e:
+        return error_result(record_id, record.get("document_type"), f"Error drafting record: {e}", time.perf_counter() - start)
+
+
+def generate_record(agent: LegalDocumentAgent, record_id: str, record: Dict[str, Any], start: float) -> Dict[str, Any]:
+    if READ_ERROR in record:
+        return error_result(record_id, "", record[READ_ERROR])
+    state = record_to_state(record_id, record)
+    if not get_questions_for_document(state["document_type"]):
+        return error_result(record_id, state["document_type"], f"Unknown document type: {state['document_type'] or '(missing)'}")
+    requested = record_to_state(record_id, record)
+    try:
+        state = agent.generate_document(state)
+    except Exception as e:
+        state["error_message"] = f"Error generating document: {e}"
+    final_document = state.get("final_document", "")
+    error_message = state.get("error_message", "")
+    return {
+        "record_id": record_id,
+        "document_type": state["document_type"],
+        "status": record_status(agent, requested, error_message, final_document),
+        "final_document": final_document,
+        "error_message": error_message,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def run(input_path: Path, output_path: Path, workers: int, agent: LegalDocumentAgent) -> Dict[str, Any]:
+    completed = load_completed_ids(output_path)
+    pending = [(rid, rec) for rid, rec in read_records(input_path) if rid not in completed]
+    summary = {"skipped": len(completed), "drafted": 0, "errors": 0, "fallbacks": 0, "llm": 0, "template": 0}
+    write_lock = threading.Lock()
+    start = time.perf_counter()
+
+    with open(output_path, 'a', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(draft_record, agent, rid, rec): (rid, rec) for rid, rec in pending}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                record_id, record = futures[future]
+                result = error_result(record_id, record.get("document_type"), f"Error drafting record: {e}")
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+            summary["drafted"] += 1
+            if result["status"] == "error":
+                summary["errors"] += 1
+            elif result["status"] == "fallback":
+                summary["fallbacks"] += 1
+            elif document_source(result["final_document"]) in ("llm", "hybrid", "sections"):
+                summary["llm"] += 1
+            else:
+                summary["template"] += 1
+            print(f"[{summary['drafted']}/{len(pending)}] {result['record_id']}: "
+                  f"{result['error_message'] or result['status']} ({result['seconds']}s)")
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    summary["docs_per_second"] = round(summary["drafted"] / summary["seconds"], 2) if summary["seconds"] else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draft legal documents in bulk from a JSONL or CSV file.")
+    parser.add_argument("input", type=Path, help="JSONL or CSV file of records")
+    parser.add_argument("output", type=Path, help="JSONL file to append drafted documents to")
+    parser.add_argument("--workers", type=int, default=8, help="Number of records drafted in parallel")
+    parser.add_argument("--mode", choices=GENERATION_MODES, default="llm", help="Generation mode; 'template' needs no network")
+    args = parser.parse_args()
+
+    agent = LegalDocumentAgent(generation_mode=args.mode)
+    summary = run(args.input, args.output, args.workers, agent)
+    print("\n=== Bulk Drafting Summary ===")
+    print(f"Drafted: {summary['drafted']} (LLM: {summary['llm']}, template: {summary['template']}, "
+          f"fell back to template: {summary['fallbacks']}, errors: {summary['errors']})")
+    if summary["errors"] or summary["fallbacks"]:
+        print("Re-run the same command to retry the failed and fallen-back records.")
+    print(f"Skipped (already done): {summary['skipped']}")
+    print(f"Elapsed: {summary['seconds']}s, throughput: {summary['docs_per_second']} docs/s")
+
+
+if __name__ == "__main__":
+    main()
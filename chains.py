@@ -0,0 +1,80 @@
+"""
+Chain Registry for the Legal Document Drafting Agent
+Parses each prompt template once and builds each prompt | llm | parser
+pipeline once per model, so the hot path only looks up a ready Runnable.
+"""
+
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+
+from prompt_templates import (
+    DOCUMENT_IDENTIFICATION_PROMPT,
+    QUESTION_GENERATION_PROMPT,
+    DOCUMENT_GENERATION_PROMPT
+)
+
+# Prompts the agent sends on every session, compiled up front by warm()
+AGENT_PROMPTS = (
+    DOCUMENT_IDENTIFICATION_PROMPT,
+    QUESTION_GENERATION_PROMPT,
+    DOCUMENT_GENERATION_PROMPT
+)
+
+
+@lru_cache(maxsize=256)
+def compile_prompt(prompt: str) -> ChatPromptTemplate:
+    """Parse a prompt template once per process; templates are immutable."""
+    return ChatPromptTemplate.from_template(prompt)
+
+
+class ChainRegistry:
+    """
+    Caches compiled chains keyed by (prompt, model, max_tokens, raw). Runnables
+    are immutable, so one chain can be invoked from many threads at once; the
+    lock only guards building it.
+    """
+    def __init__(self):
+        self._chains: Dict[Tuple[str, str, Optional[int], bool], Runnable] = {}
+        self._parser = StrOutputParser()
+        self._lock = threading.Lock()
+
+    def get(self, prompt: str, model: str, llm: BaseChatModel, max_tokens: Optional[int] = None, raw: bool = False) -> Runnable:
+        """
+        max_tokens overrides the client's output limit for this chain only. raw
+        chains return the model's message, with its finish reason, instead of a string.
+        """
+        key = (prompt, model, max_tokens, raw)
+        chain = self._chains.get(key)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    bound = llm.bind(max_tokens=max_tokens) if max_tokens else llm
+                    chain = compile_prompt(prompt) | bound
+                    if not raw:
+                        chain = chain | self._parser
+                    self._chains[key] = chain
+        return chain
+
+    def warm(self, models: Iterable[str], get_llm: Callable[[str], Optional[BaseChatModel]], prompts: Iterable[str] = AGENT_PROMPTS) -> None:
+        """Build the chains for every agent prompt and model ahead of the first request."""
+        prompts = tuple(prompts)
+        for model in models:
+            llm = get_llm(model)
+            if llm is None:
+                continue
+            for prompt in prompts:
+                self.get(prompt, model, llm)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chains.clear()
+
+    def __len__(self) -> int:
+        return len(self._chains)
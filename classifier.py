@@ -0,0 +1,143 @@
+"""
+Document Type Classifier
+Maps a free-text request ("I need an NDA for my startup") to a document type
+using the alias registry. Exact aliases are found with one compiled regex
+alternation; when none matches, misspelt words are corrected against a
+trigram index of the alias vocabulary and the aliases are searched again.
+Every result carries a confidence so the agent only asks the LLM when the
+local match is weak.
+"""
+
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from document_registry import document_registry
+from prompt_templates import get_document_type_aliases
+
+# Below this confidence the agent asks the LLM to identify the document type
+LLM_FALLBACK_THRESHOLD = 0.75
+# Local matches below this confidence are never used, even when the LLM can't help
+MIN_CONFIDENCE = 0.5
+# Words are only corrected to alias words at least this similar
+MIN_SIMILARITY = 0.6
+# Shorter words are too ambiguous to correct
+MIN_FUZZY_LENGTH = 4
+
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+class Classification(NamedTuple):
+    document_type: Optional[str]
+    confidence: float
+    method: str  # "alias", "fuzzy", "llm" or "none"
+
+
+def normalize_text(text: str) -> str:
+    return NON_ALPHANUMERIC.sub(" ", text.lower()).strip()
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text}  "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class DocumentTypeClassifier:
+    """Alias index for a registry of {document type: [aliases]}."""
+    def __init__(self, aliases: Dict[str, Iterable[str]]):
+        self.alias_types: Dict[str, str] = {}
+        for document_type, names in aliases.items():
+            for name in [document_type, *names]:
+                self.alias_types.setdefault(normalize_text(name), document_type)
+        self.alias_types.pop("", None)
+        # Longest aliases first, so "employment contract" wins over "contract"
+        ordered = sorted(self.alias_types, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(?:" + "|".join(re.escape(alias) for alias in ordered) + r")\b") if ordered else None
+        # Trigram index over the distinct words of all aliases, for typo correction
+        self.vocabulary: Set[str] = {word for alias in self.alias_types for word in alias.split()}
+        self.word_trigrams: Dict[str, FrozenSet[str]] = {word: trigrams(word) for word in self.vocabulary}
+        self.trigram_index: Dict[str, List[str]] = defaultdict(list)
+        for word, grams in self.word_trigrams.items():
+            for gram in grams:
+                self.trigram_index[gram].append(word)
+
+    @property
+    def document_types(self) -> Set[str]:
+        return set(self.alias_types.values())
+
+    def classify(self, text: str) -> Classification:
+        normalized = normalize_text(text)
+        if not normalized:
+            return Classification(None, 0.0, "none")
+        return self.match_aliases(normalized) or self.match_fuzzy(normalized) or Classification(None, 0.0, "none")
+
+    def lookup(self, name: str) -> Optional[str]:
+        """The document type a bare name or alias refers to ("NDA", "lease agreement"), or None for any other text."""
+        return self.alias_types.get(normalize_text(name))
+
+    def match_aliases(self, normalized: str, similarities: Optional[List[float]] = None) -> Optional[Classification]:
+        """
+        Exact alias hits, weighted by alias length and, for corrected text, by
+        how closely the corrected words matched; mixed types lower the confidence.
+        """
+        if self.pattern is None:
+            return None
+        if similarities is not None:
+            word_starts = [m.start() for m in re.finditer(r"\S+", normalized)]
+        scores: Counter = Counter()
+        closeness: Dict[str, float] = {}
+        for match in self.pattern.finditer(normalized):
+            document_type = self.alias_types[match.group(0)]
+            similarity = 1.0
+            if similarities is not None:
+                first, last = bisect_left(word_starts, match.start()), bisect_left(word_starts, match.end())
+                similarity = min(similarities[first:last])
+            scores[document_type] += len(match.group(0)) * similarity
+            closeness[document_type] = max(closeness.get(document_type, 0.0), similarity)
+        if not scores:
+            return None
+        document_type, score = scores.most_common(1)[0]
+        return Classification(document_type, score / sum(scores.values()) * closeness[document_type], "alias")
+
+    def match_fuzzy(self, normalized: str) -> Optional[Classification]:
+        """
+        Correct each word to its closest alias word by trigram (Dice)
+        similarity, then look for aliases again. The vocabulary of alias words
+        stays small however many document types there are, so this is cheap.
+        """
+        corrected, similarities = [], []
+        for word in normalized.split():
+            replacement, similarity = self.closest_word(word)
+            corrected.append(replacement)
+            similarities.append(similarity)
+        if corrected == normalized.split():
+            return None
+        match = self.match_aliases(" ".join(corrected), similarities)
+        if match is None:
+            return None
+        return Classification(match.document_type, match.confidence, "fuzzy")
+
+    def closest_word(self, word: str) -> Tuple[str, float]:
+        if word in self.vocabulary or len(word) < MIN_FUZZY_LENGTH:
+            return word, 1.0
+        grams = trigrams(word)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self.trigram_index.get(gram, ()))
+        best, best_similarity = word, 0.0
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(self.word_trigrams[candidate]))
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        return (best, best_similarity) if best_similarity >= MIN_SIMILARITY else (word, 1.0)
+
+
+@lru_cache(maxsize=1)
+def get_document_classifier() -> DocumentTypeClassifier:
+    """Classifier for the registered document types, built on first use."""
+    return DocumentTypeClassifier(get_document_type_aliases())
+
+
+document_registry.on_reload(get_document_classifier.cache_clear)
@@ -0,0 +1,175 @@
+"""
+Document Type Registry
+Loads document type definitions (aliases, questions, template and hybrid-mode
+prose sections) from a directory of YAML files on first use. Each file is
+validated and compiled once; the result is cached against the file's mtime,
+so refresh() only re-reads files that changed. Lookups by type or alias are
+a single dict lookup once the registry is loaded.
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from template_engine import CompiledTemplate, TemplateError
+
+DEFAULT_REGISTRY_DIR = Path(__file__).resolve().parent / "document_types"
+# Entities a question can declare in its "extract" entry (see extraction.py)
+EXTRACTION_KINDS = ("party", "duration", "jurisdiction", "amount", "date")
+
+
+class DocumentRegistryError(ValueError):
+    """Raised when a document type definition is missing or invalid."""
+
+
+class DocumentDefinition:
+    """One validated document type, with its template compiled."""
+    __slots__ = ("document_type", "title", "aliases", "questions", "template", "prose_sections", "derived_fields", "path", "mtime")
+
+    def __init__(self, document_type: str, title: str, aliases: List[str], questions: Dict[str, Dict[str, Any]],
+                 template: CompiledTemplate, prose_sections: Dict[str, Dict[str, str]], derived_fields: List[str],
+                 path: Optional[Path] = None, mtime: int = 0):
+        self.document_type = document_type
+        self.title = title
+        self.aliases = aliases
+        self.questions = questions
+        self.template = template
+        self.prose_sections = prose_sections
+        self.derived_fields = derived_fields
+        self.path = path
+        self.mtime = mtime
+
+    def __repr__(self) -> str:
+        return f"DocumentDefinition({self.document_type!r}, {len(self.questions)} questions)"
+
+
+def parse_definition(data: Any, path: Path, mtime: int = 0) -> DocumentDefinition:
+    """Validate one parsed YAML file and compile its template."""
+    def fail(message: str) -> DocumentRegistryError:
+        return DocumentRegistryError(f"{path.name}: {message}")
+
+    if not isinstance(data, dict):
+        raise fail("expected a mapping at the top level")
+    document_type = str(data.get("document_type") or path.stem).strip().lower()
+    questions = data.get("questions")
+    if not isinstance(questions, dict) or not questions:
+        raise fail("'questions' must be a non-empty mapping of field name to question")
+    for field, config in questions.items():
+        if not isinstance(config, dict) or not isinstance(config.get("question"), str):
+            raise fail(f"question {field} needs a 'question' string")
+        extract = config.get("extract")
+        if extract is not None and (not isinstance(extract, dict) or extract.get("kind") not in EXTRACTION_KINDS):
+            raise fail(f"question {field} has an 'extract' entry whose kind is not one of {', '.join(EXTRACTION_KINDS)}")
+    source = data.get("template")
+    if not isinstance(source, str) or not source.strip():
+        raise fail("'template' must be a non-empty string")
+    prose_sections = data.get("prose_sections") or {}
+    derived_fields = list(data.get("derived_fields") or [])
+
+    try:
+        template = CompiledTemplate(document_type, source)
+    except TemplateError as e:
+        raise fail(str(e)) from e
+    unknown = template.placeholders - questions.keys() - set(derived_fields)
+    if unknown:
+        raise fail(f"template uses placeholders with no matching question: {', '.join(sorted(unknown))}")
+    for placeholder, section in prose_sections.items():
+        if placeholder not in template.placeholders:
+            raise fail(f"prose section {placeholder} is not a template placeholder")
+        if section.get("source") not in questions or not section.get("instruction"):
+            raise fail(f"prose section {placeholder} needs a 'source' question and an 'instruction'")
+
+    aliases = [str(alias).strip().lower() for alias in data.get("aliases") or []]
+    return DocumentDefinition(
+        document_type=document_type,
+        title=str(data.get("title") or document_type),
+        aliases=aliases,
+        questions=questions,
+        template=template,
+        prose_sections=prose_sections,
+        derived_fields=derived_fields,
+        path=path,
+        mtime=mtime
+    )
+
+
+def load_definition(path: Path) -> DocumentDefinition:
+    # Imported here so that importing the registry (and the prompts) stays cheap
+    import yaml
+
+    mtime = path.stat().st_mtime_ns
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.load(f, Loader=loader)
+    except yaml.YAMLError as e:
+        raise DocumentRegistryError(f"{path.name}: invalid YAML: {e}") from e
+    return parse_definition(data, path, mtime)
+
+
+class DocumentRegistry:
+    """All document types defined in one directory, keyed by type and alias."""
+    def __init__(self, directory: Path = DEFAULT_REGISTRY_DIR):
+        self.directory = Path(directory)
+        self._files: Dict[Path, DocumentDefinition] = {}
+        self._lookup: Dict[str, DocumentDefinition] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+    def on_reload(self, callback: Callable[[], None]) -> None:
+        """Call back whenever definitions change, so derived caches can be cleared."""
+        self._listeners.append(callback)
+
+    def refresh(self) -> bool:
+        """Re-read new or modified files and drop deleted ones. Returns whether anything changed."""
+        with self._lock:
+            paths = sorted(self.directory.glob("*.yaml")) + sorted(self.directory.glob("*.yml"))
+            files: Dict[Path, DocumentDefinition] = {}
+            for path in paths:
+                cached = self._files.get(path)
+                files[path] = cached if cached is not None and cached.mtime == path.stat().st_mtime_ns else load_definition(path)
+            changed = not self._loaded or files.keys() != self._files.keys() or any(
+                files[path] is not self._files[path] for path in files
+            )
+            if changed:
+                self._lookup = self.build_lookup(files.values())
+                self._files = files
+            self._loaded = True
+        if changed:
+            for callback in self._listeners:
+                callback()
+        return changed
+
+    @staticmethod
+    def build_lookup(definitions: Iterable[DocumentDefinition]) -> Dict[str, DocumentDefinition]:
+        lookup: Dict[str, DocumentDefinition] = {}
+        for definition in definitions:
+            for name in [definition.document_type, *definition.aliases]:
+                existing = lookup.get(name)
+                if existing is not None and existing is not definition:
+                    raise DocumentRegistryError(
+                        f"'{name}' names both {existing.document_type} and {definition.document_type}"
+                    )
+                lookup[name] = definition
+        return lookup
+
+    def get(self, document_type: str) -> Optional[DocumentDefinition]:
+        if not self._loaded:
+            self.refresh()
+        return self._lookup.get(document_type.lower())
+
+    def definitions(self) -> List[DocumentDefinition]:
+        if not self._loaded:
+            self.refresh()
+        return list(self._files.values())
+
+    def aliases(self) -> Dict[str, List[str]]:
+        """{document type: aliases} for every registered type."""
+        return {definition.document_type: definition.aliases for definition in self.definitions()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"loaded": self._loaded, "files": len(self._files), "names": len(self._lookup)}
+
+
+document_registry = DocumentRegistry()
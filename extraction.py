@@ -0,0 +1,238 @@
+"""
+Local Answer Extraction
+Deterministic, regex-based extraction of parties, durations, jurisdictions,
+amounts and dates from free text, so one message ("Draft an NDA between Alice
+and Bob for 2 years under California law") can fill several questions.
+
+Which fields an entity may fill is declared per question in the document type
+YAML with an "extract" entry, e.g.
+    extract: {kind: party, position: 0, roles: [landlord, lessor]}
+    extract: {kind: amount, context: [rent, per month, monthly]}
+Every value carries a confidence; the agent only pre-fills fields at or above
+PREFILL_THRESHOLD and asks the question as usual otherwise.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from document_registry import document_registry
+from prompt_templates import get_questions_for_document
+
+PREFILL_THRESHOLD = 0.75
+# How far (in characters) a context keyword may be from an amount or date
+CONTEXT_WINDOW = 40
+
+NAME = r"[A-Z][\w&'-]*(?:\s+(?:[A-Z][\w&'-]*|&|of))*(?:,?\s+(?:Inc|LLC|Ltd|Corp|Co|GmbH)\.?)?"
+BETWEEN = re.compile(rf"\bbetween\s+(?:the\s+)?(?:\w+\s+)??({NAME})\s+and\s+(?:the\s+)?(?:\w+\s+)??({NAME})(?=[\s,.;:)]|$)")
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12
+}
+DURATION = re.compile(
+    r"\b(\d+|" + "|".join(NUMBER_WORDS) + r")[\s-]+(year|month|week|day)s?\b|\b(indefinite(?:ly)?|perpetual(?:ly)?|month[\s-]to[\s-]month)\b",
+    re.IGNORECASE
+)
+PLACE = r"[A-Z][a-zA-Z.]*(?:\s+[A-Z][a-zA-Z.]*){0,2}(?:,\s+[A-Z][a-zA-Z]+)?"
+# Keywords match in any case; place names must stay capitalised, as that is
+# what tells "New York" from the words around it
+STATE_OF = r"(?i:the\s+state\s+of\s+)?"
+JURISDICTION = re.compile(
+    rf"\b(?i:under|per)\s+(?i:the\s+)?(?i:laws?\s+of\s+)?{STATE_OF}({PLACE})\s+(?i:law)\b"
+    rf"|\b(?i:governed\s+by|under|per)\s+(?i:the\s+)?(?i:laws?\s+of)\s+{STATE_OF}({PLACE})"
+    rf"|\b({PLACE})\s+(?i:law|jurisdiction|courts)\b"
+    rf"|\b(?i:jurisdiction)(?:\s+(?i:is|of)|:)\s+{STATE_OF}({PLACE})"
+)
+AMOUNT = re.compile(
+    r"(?:US\$|\$|€|£|USD\s?|EUR\s?|GBP\s?)\s?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?:\s?[kK]\b)?"
+    r"|\b(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?\s?(?:dollars|usd|eur|euros|pounds|gbp)\b",
+    re.IGNORECASE
+)
+MONTHS = r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+DATE = re.compile(
+    rf"\b{MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}\b"
+    rf"|\b\d{{1,2}}(?:st|nd|rd|th)?\s+{MONTHS}\.?,?\s+\d{{4}}\b"
+    r"|\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}/\d{1,2}/\d{2,4}\b",
+    re.IGNORECASE
+)
+KNOWN_PLACES = frozenset(place.lower() for place in (
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware", "Florida",
+    "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine",
+    "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska",
+    "Nevada", "New Hampshire", "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio",
+    "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas",
+    "Utah", "Vermont", "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming", "Ontario", "Quebec",
+    "British Columbia", "England", "England and Wales", "Scotland", "Ireland", "Delaware", "Singapore", "India"
+))
+
+
+class Extraction(NamedTuple):
+    value: str
+    confidence: float
+    kind: str
+
+
+def nearest_keyword(text: str, start: int, end: int, keywords: Iterable[str]) -> Optional[int]:
+    """Distance from a match to the closest context keyword within CONTEXT_WINDOW, or None."""
+    lowered = text.lower()
+    window_start = max(0, start - CONTEXT_WINDOW)
+    best = None
+    for keyword in keywords:
+        for match in re.finditer(re.escape(keyword.lower()), lowered[window_start:end + CONTEXT_WINDOW]):
+            position = window_start + match.start()
+            distance = start - (position + len(keyword)) if position < start else position - end
+            if distance >= 0 and (best is None or distance < best):
+                best = distance
+    return best
+
+
+def clean_name(name: str) -> str:
+    """Drop trailing punctuation, keeping the period of a company suffix such as "Inc."."""
+    name = name.strip(" ,")
+    if name.endswith(".") and not re.search(r"\b(?:Inc|Ltd|Corp|Co)\.$", name):
+        name = name[:-1]
+    return name
+
+
+def normalize_duration(match: "re.Match") -> str:
+    if match.group(3):
+        return match.group(3).lower().replace("-", " ")
+    count = match.group(1).lower()
+    count = NUMBER_WORDS.get(count, count)
+    unit = match.group(2).lower()
+    return f"{count} {unit}{'' if str(count) == '1' else 's'}"
+
+
+class AnswerExtractor:
+    """Field extractors for one document type, compiled from the questions' "extract" entries."""
+    def __init__(self, questions: Dict[str, Dict[str, Any]]):
+        self.specs: Dict[str, Dict[str, Any]] = {}
+        for field, config in questions.items():
+            spec = config.get("extract")
+            if not spec:
+                continue
+            spec = dict(spec)
+            roles = spec.get("roles") or []
+            if roles:
+                # Only the role words ignore case; names must stay capitalised
+                role = r"(?i:(?:the\s+)?(?:" + "|".join(re.escape(name) for name in sorted(roles, key=len, reverse=True)) + "))"
+                spec["role_patterns"] = (
+                    re.compile(rf"\b{role}\s*(?:is|will\s+be|:|=|-)?\s+(?:the\s+)?({NAME})(?=[\s,.;:)]|$)"),
+                    re.compile(rf"({NAME})\s*\({role}\)"),
+                    re.compile(rf"({NAME})\s+as\s+{role}\b")
+                )
+            self.specs[field] = spec
+
+    def extract(self, text: str, skip: Iterable[str] = ()) -> Dict[str, Extraction]:
+        """Every field (not in skip) that the text gives a value for, with its confidence."""
+        skip = set(skip)
+        fields = {field: spec for field, spec in self.specs.items() if field not in skip}
+        if not text or not fields:
+            return {}
+        found: Dict[str, Extraction] = {}
+        found.update(self.extract_parties(text, fields))
+        found.update(self.extract_durations(text, fields))
+        found.update(self.extract_jurisdictions(text, fields))
+        found.update(self.extract_by_context(text, fields, "amount", AMOUNT))
+        found.update(self.extract_by_context(text, fields, "date", DATE))
+        return found
+
+    def fields_of(self, fields: Dict[str, Dict[str, Any]], kind: str) -> Dict[str, Dict[str, Any]]:
+        return {field: spec for field, spec in fields.items() if spec.get("kind") == kind}
+
+    def extract_parties(self, text: str, fields: Dict[str, Dict[str, Any]]) -> Dict[str, Extraction]:
+        party_fields = self.fields_of(fields, "party")
+        if not party_fields:
+            return {}
+        found = {}
+        # An explicit role ("the landlord is Alice", "Bob (the tenant)") beats position
+        for field, spec in party_fields.items():
+            for pattern in spec.get("role_patterns", ()):
+                match = pattern.search(text)
+                if match:
+                    found[field] = Extraction(clean_name(match.group(1)), 0.9, "party")
+                    break
+        between = BETWEEN.search(text)
+        if between:
+            named = {extraction.value for extraction in found.values()}
+            for field, spec in party_fields.items():
+                position = spec.get("position")
+                if field in found or position not in (0, 1):
+                    continue
+                value = clean_name(between.group(position + 1))
+                if value not in named:
+                    found[field] = Extraction(value, 0.85, "party")
+        return found
+
+    def extract_durations(self, text: str, fields: Dict[str, Dict[str, Any]]) -> Dict[str, Extraction]:
+        duration_fields = self.fields_of(fields, "duration")
+        match = DURATION.search(text) if duration_fields else None
+        if not match:
+            return {}
+        # "for 2 years" is a term; a bare "2 years" could be anything, such as an age
+        before = text[max(0, match.start() - 12):match.start()].lower()
+        framed = match.group(3) or re.search(r"\b(?:for|of|term|lasting|last|duration)\b", before)
+        found = {}
+        for field, spec in duration_fields.items():
+            near = nearest_keyword(text, match.start(), match.end(), spec.get("context", ()))
+            confidence = 0.9 if framed else 0.85 if near is not None and near <= 12 else 0.7
+            found[field] = Extraction(normalize_duration(match), confidence, "duration")
+        return found
+
+    def extract_jurisdictions(self, text: str, fields: Dict[str, Dict[str, Any]]) -> Dict[str, Extraction]:
+        jurisdiction_fields = self.fields_of(fields, "jurisdiction")
+        match = JURISDICTION.search(text) if jurisdiction_fields else None
+        if not match:
+            return {}
+        place = next(group for group in match.groups() if group).strip(" ,.")
+        if match.group(3):
+            # A bare mention ("our Delaware courts case", "a Tax law firm") doesn't
+            # say which law governs, so ask
+            confidence = 0.6
+        elif place.lower() in KNOWN_PLACES:
+            confidence = 0.9
+        elif match.group(2) or match.group(4) or re.search(r"\blaws?\s+of\b", match.group(0), re.IGNORECASE):
+            # "governed by the laws of Ruritania" names a place even when it isn't a known one
+            confidence = 0.8
+        else:
+            # "under Intellectual Property law": likely an area of law, so ask
+            confidence = 0.6
+        return {field: Extraction(place, confidence, "jurisdiction") for field in jurisdiction_fields}
+
+    def extract_by_context(self, text: str, fields: Dict[str, Dict[str, Any]], kind: str, pattern: "re.Pattern") -> Dict[str, Extraction]:
+        """
+        Give each amount or date to the field whose context keywords are
+        nearest to it ("rent of $1,500, deposit $3,000"). A value with no
+        keyword nearby only fills a field when it is the only one of its kind.
+        """
+        kind_fields = self.fields_of(fields, kind)
+        if not kind_fields:
+            return {}
+        matches = list(pattern.finditer(text))
+        found: Dict[str, Extraction] = {}
+        for match in matches:
+            distances = {
+                field: nearest_keyword(text, match.start(), match.end(), spec.get("context", ()))
+                for field, spec in kind_fields.items() if field not in found
+            }
+            distances = {field: distance for field, distance in distances.items() if distance is not None}
+            if distances:
+                field = min(distances, key=distances.get)
+                found[field] = Extraction(match.group(0).strip(), 0.85, kind)
+        if not found and len(matches) == 1 and len(kind_fields) == 1 and len(self.fields_of(self.specs, kind)) == 1:
+            field = next(iter(kind_fields))
+            found[field] = Extraction(matches[0].group(0).strip(), 0.75, kind)
+        return found
+
+
+def prefill_answers(extractions: Dict[str, Extraction], threshold: float = PREFILL_THRESHOLD) -> Dict[str, Tuple[str, float]]:
+    """The extractions confident enough to fill their fields without asking."""
+    return {field: (e.value, e.confidence) for field, e in extractions.items() if e.confidence >= threshold}
+
+
+@lru_cache(maxsize=64)
+def get_answer_extractor(document_type: str) -> AnswerExtractor:
+    return AnswerExtractor(get_questions_for_document(document_type))
+
+
+document_registry.on_reload(get_answer_extractor.cache_clear)
@@ -2,125 +2,710 @@
 Conversational Legal Document Drafting Agent using LangGraph
 """
 
+import asyncio
 import os
-from typing import Dict, Any, List
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional, Set, Tuple, TypedDict
 from datetime import datetime
 from langgraph.graph import StateGraph, END
 # Updated imports - replace the old ones
 from langchain_openai import ChatOpenAI  # Changed from langchain.chat_models
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
-from memory import SessionMemoryManager
+from chains import ChainRegistry
+from classifier import LLM_FALLBACK_THRESHOLD, MIN_CONFIDENCE, Classification, get_document_classifier
+from extraction import get_answer_extractor, prefill_answers
+from health import health_cache
+from llm_cache import ResponseCache, response_cache
+from memory import get_session_manager
+from question_phrasing import phrasing_key, question_phrasings
+from questionnaire import Questionnaire, get_questionnaire
+from resilience import (CircuitBreaker, CircuitOpenError, HedgingPolicy, LatencyTracker, circuit_breakers, hedge_executor,
+                        is_provider_error)
+from sections import TemplateSection, affected_sections, plan_sections, render_sections
+from template_engine import CompiledTemplate
 from prompt_templates import (
     DOCUMENT_IDENTIFICATION_PROMPT,
     QUESTION_GENERATION_PROMPT,
     DOCUMENT_GENERATION_PROMPT,
+    SECTION_GENERATION_PROMPT,
+    SECTION_DRAFTING_PROMPT,
+    CONTINUATION_PROMPT,
     get_questions_for_document,
-    get_template_for_document,
-    get_missing_required_fields,
+    get_compiled_template,
+    get_prose_sections,
     format_collected_info_for_display
 )
 
 load_dotenv()
 
+PRIMARY_MODEL = "deepseek/deepseek-chat"
+FALLBACK_MODEL = "deepseek/deepseek-coder"
+
+LLM_DOCUMENT_MARKER = "\n\n[Generated by LLM (OpenRouter DeepSeek)]"
+TEMPLATE_DOCUMENT_MARKER = "\n\n[Generated by predefined template]"
+HYBRID_DOCUMENT_MARKER = "\n\n[Generated by predefined template with LLM-drafted sections]"
+SECTIONS_DOCUMENT_MARKER = "\n\n[Generated by LLM section by section (OpenRouter DeepSeek)]"
+DOCUMENT_MARKERS = {
+    "llm": LLM_DOCUMENT_MARKER,
+    "template": TEMPLATE_DOCUMENT_MARKER,
+    "hybrid": HYBRID_DOCUMENT_MARKER,
+    "sections": SECTIONS_DOCUMENT_MARKER
+}
+# Hybrid sections are a sentence or a short list, far below the full-document limit
+SECTION_MAX_TOKENS = 400
+# Budget per numbered section in "sections" mode, and how often a cut-off section is continued
+LONG_SECTION_MAX_TOKENS = 1500
+MAX_CONTINUATIONS = 3
+HEALTH_CHECK_PROMPT = "Say 'test' if you can respond."
+
+# The model sometimes labels its answer the way the prompt's examples do ("Type: NDA")
+LLM_TYPE_LABEL = re.compile(r"^\W*type\s*:\s*", re.IGNORECASE)
+
+GENERATION_MODES = ("llm", "template", "hybrid", "sections")
+# How many upcoming questions are phrased ahead in conversational mode
+PREFETCH_QUESTIONS = 3
+# Modes whose drafts can be patched when optional answers arrive later
+SPECULATIVE_MODES = ("hybrid", "sections")
+# Background workers for speculative drafts; each draft fans its own LLM calls out further
+speculative_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-draft")
+# Drafts of sessions that never reach generation are dropped after this long, or beyond this many
+SPECULATIVE_DRAFT_TTL = 30 * 60.0
+MAX_SPECULATIVE_DRAFTS = 256
+
 class AgentState(BaseModel):
     session_id: str = Field(description="Session identifier")
     user_input: str = Field(default="", description="Current user input")
     document_type: str = Field(default="", description="Type of document to draft")
     collected_info: Dict[str, Any] = Field(default_factory=dict, description="Collected information")
     current_question: str = Field(default="", description="Current question being asked")
+    current_field: str = Field(default="", description="Field the current question asks for")
+    answered_mask: int = Field(default=0, description="Bitmask over the questionnaire of questions answered or skipped")
     conversation_history: List[Dict[str, str]] = Field(default_factory=list, description="Conversation history")
     is_complete: bool = Field(default=False, description="Whether all information is collected")
     final_document: str = Field(default="", description="Generated final document")
     error_message: str = Field(default="", description="Error message if any")
+    generation_mode: str = Field(default="", description="llm, template, hybrid or sections; empty uses the agent default")
+    document_sections: Dict[str, str] = Field(default_factory=dict, description="Text of each document section, for incremental updates")
+    drafted_prose: Dict[str, str] = Field(default_factory=dict, description="LLM-drafted values of hybrid-mode prose placeholders")
+    extracted_fields: Dict[str, float] = Field(default_factory=dict, description="Fields filled from free text without asking, with their confidence")
+
+class GraphState(TypedDict, total=False):
+    """Dict form of AgentState used as the StateGraph schema, since the nodes work on dicts."""
+    session_id: str
+    user_input: str
+    document_type: str
+    collected_info: Dict[str, Any]
+    current_question: str
+    current_field: str
+    answered_mask: int
+    conversation_history: List[Dict[str, str]]
+    is_complete: bool
+    final_document: str
+    error_message: str
+    generation_mode: str
+    document_sections: Dict[str, str]
+    drafted_prose: Dict[str, str]
+    extracted_fields: Dict[str, float]
+
+def is_truncated(message: AIMessage) -> bool:
+    """Whether the model stopped because it hit its output token limit."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    return metadata.get("finish_reason") == "length" or metadata.get("stop_reason") == "max_tokens"
+
+def document_source(document: str) -> str:
+    """Which generation path produced a final document: llm, template, hybrid, sections, or "" if unknown."""
+    for source, marker in DOCUMENT_MARKERS.items():
+        if document.endswith(marker):
+            return source
+    return ""
+
+def strip_document_marker(document: str) -> str:
+    source = document_source(document)
+    return document[:-len(DOCUMENT_MARKERS[source])].strip() if source else document.strip()
+
+def copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a state so batch generation doesn't mutate the caller's dicts."""
+    state = dict(state)
+    state["collected_info"] = dict(state.get("collected_info", {}))
+    state["conversation_history"] = list(state.get("conversation_history", []))
+    if "extracted_fields" in state:
+        state["extracted_fields"] = dict(state["extracted_fields"])
+    return state
+
+def batch_result(state: Dict[str, Any], result: Any) -> Dict[str, Any]:
+    if isinstance(result, Exception):
+        state["error_message"] = f"Error generating document: {result}"
+        return state
+    return result
+
+class SpeculativeDraft:
+    """
+    A session's background draft. Its links run one at a time, each applying
+    the answers given since the previous one to that link's finished draft;
+    the next link is submitted when the previous one finishes, so no worker
+    ever waits on another. Answers that arrive while a link runs are
+    coalesced into one pending snapshot, as each snapshot holds them all.
+    """
+    def __init__(self, mode: str, executor: ThreadPoolExecutor, step: Callable[[Optional[Dict[str, Any]], Dict[str, Any]], Dict[str, Any]]):
+        self.mode = mode
+        self.executor = executor
+        # step(previous draft or None, snapshot) -> next draft
+        self.step = step
+        self.updated_at = time.monotonic()
+        self.future: Optional[Future] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._latest: Optional[Dict[str, Any]] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def update(self, snapshot: Dict[str, Any]) -> None:
+        """Draft snapshot next: now if nothing is running, else once the running link finishes."""
+        with self._lock:
+            if self._closed:
+                return
+            self.updated_at = time.monotonic()
+            if self.future is not None:
+                self._pending = snapshot
+                return
+            future = self._submit(snapshot)
+        future.add_done_callback(self.finished)
+
+    def _submit(self, snapshot: Dict[str, Any]) -> Future:
+        """Start the next link. Called with the lock held."""
+        self.future = self.executor.submit(self.step, self._latest, snapshot)
+        return self.future
+
+    def finished(self, future: Future) -> None:
+        following = None
+        with self._lock:
+            if not future.cancelled():
+                if future.exception() is not None:
+                    print(f"Speculative draft failed: {future.exception()}")
+                else:
+                    self._latest = future.result()
+            self.future = None
+            if self._pending is not None and not self._closed:
+                following = self._submit(self._pending)
+            self._pending = None
+        if following is not None:
+            following.add_done_callback(self.finished)
+
+    def close(self) -> Optional[Future]:
+        """
+        Stop the chain: drop the pending snapshot and cancel the link still
+        queued. Returns the link still running, if any, whose draft becomes
+        latest() when it finishes.
+        """
+        with self._lock:
+            self._closed = True
+            self._pending = None
+            future = self.future
+        if future is not None and future.cancel():
+            return None
+        return future
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """The newest finished version."""
+        with self._lock:
+            return self._latest
+
 
 class LegalDocumentAgent:
-    def __init__(self):
+    def __init__(self, api_key: Optional[str] = None, health_check: str = "lazy", cache: Optional[ResponseCache] = None,
+                 hedging: Optional[HedgingPolicy] = None, generation_mode: str = "llm", speculative_drafting: bool = True,
+                 conversational_questions: bool = False, extract_answers: bool = True):
+        # Get API key from the argument or from environment variable
+        self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+        if generation_mode not in GENERATION_MODES:
+            raise ValueError(f"Unknown generation mode: {generation_mode}. Expected one of {', '.join(GENERATION_MODES)}.")
+        # Template mode drafts without the network; without a key its optional LLM calls just report no models
+        if not self.api_key and generation_mode != "template":
+            raise ValueError("Missing OPENROUTER_API_KEY. Please set it in environment variables or pass it to the agent.")
+        self.response_cache = cache if cache is not None else response_cache
+        self.generation_mode = generation_mode
+        # When set, a slow primary is raced against the fallback model
+        self.hedging = hedging
+        self.latencies = LatencyTracker()
+        self.circuit_breakers = circuit_breakers
         self.setup_llms()
-        self.memory_manager = SessionMemoryManager()
+        # Shared by every agent in the process: one store, index and flusher per directory
+        self.memory_manager = get_session_manager()
+        # When set, drafting starts once the required fields are known (see start_speculative_draft)
+        self.speculative_drafting = speculative_drafting
+        # When set, questions are phrased by the LLM in the background and served from question_phrasings
+        self.conversational_questions = conversational_questions
+        self.question_phrasings = question_phrasings
+        # When set, the request and every answer are scanned for values of other questions
+        self.extract_answers = extract_answers
+        # session_id -> speculative draft, least recently updated first
+        self._speculative_drafts: "OrderedDict[str, SpeculativeDraft]" = OrderedDict()
+        self._speculative_lock = threading.Lock()
         self.graph = self.create_graph()
+        self.async_graph = self.create_graph(use_async=True)
+        # "lazy" checks on first real use, "background" probes (and compiles the
+        # agent's chains) in a daemon thread, "eager" does both before returning
+        # (the old startup behaviour)
+        if health_check == "background":
+            self.check_health_async()
+        elif health_check == "eager":
+            self.warm_chains()
+            self.check_health()
 
     def setup_llms(self):
-        # Get API key from environment variable or from session state
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        
-        if not api_key:
-            raise ValueError("Missing OPENROUTER_API_KEY. Please set it in environment variables or pass it to the agent.")
-
-        # OpenRouter configuration
-        openrouter_config = {
+        # OpenRouter configuration; clients are only built when first needed
+        self.openrouter_config = {
             "temperature": 0.1,
             "max_tokens": 4000,
-            "api_key": api_key,  # Use api_key parameter instead of openai_api_key
+            "api_key": self.api_key,  # Use api_key parameter instead of openai_api_key
             "base_url": "https://openrouter.ai/api/v1",  # Use base_url instead of openai_api_base
         }
+        self._llms: Dict[str, Optional[ChatOpenAI]] = {}
+        self._llm_lock = threading.Lock()
+        # Compiled prompt | llm | parser pipelines, reused across calls and threads
+        self.chains = ChainRegistry()
+
+    def get_llm(self, model: str) -> Optional[ChatOpenAI]:
+        """Build the client for a model on first use and reuse it afterwards."""
+        if model in self._llms:
+            return self._llms[model]
+        if not self.api_key:
+            return None
+        with self._llm_lock:
+            if model not in self._llms:
+                try:
+                    self._llms[model] = ChatOpenAI(model=model, **self.openrouter_config)
+                except Exception as e:
+                    print(f"Failed to initialize {model}: {e}")
+                    self._llms[model] = None
+        return self._llms[model]
+
+    @property
+    def primary_llm(self) -> Optional[ChatOpenAI]:
+        return self.get_llm(PRIMARY_MODEL)
 
+    @property
+    def fallback_llm(self) -> Optional[ChatOpenAI]:
+        return self.get_llm(FALLBACK_MODEL)
+
+    def warm_chains(self) -> None:
+        """Compile the agent prompts for both models before the first request needs them."""
+        self.chains.warm([PRIMARY_MODEL, FALLBACK_MODEL], self.get_llm)
+
+    def is_model_available(self, model: str) -> bool:
+        """A model is skipped only if it was recently found unhealthy."""
+        return health_cache.get(self.api_key, model) is not False
+
+    def check_health(self, models: Optional[List[str]] = None, force: bool = False) -> Dict[str, bool]:
+        """Probe each model once per TTL and return the health results."""
+        results = {}
+        if not self.api_key:
+            return {model: False for model in models or [PRIMARY_MODEL, FALLBACK_MODEL]}
+        for model in models or [PRIMARY_MODEL, FALLBACK_MODEL]:
+            cached = None if force else health_cache.get(self.api_key, model)
+            if cached is not None:
+                results[model] = cached
+                continue
+            llm = self.get_llm(model)
+            healthy = False
+            if llm is not None:
+                try:
+                    self.chains.get(HEALTH_CHECK_PROMPT, model, llm).invoke({})
+                    healthy = True
+                except Exception as e:
+                    print(f"{model} health check failed: {e}")
+            health_cache.set(self.api_key, model, healthy)
+            results[model] = healthy
+        return results
+
+    def check_health_async(self, models: Optional[List[str]] = None) -> threading.Thread:
+        """Warm the chains and run check_health in a daemon thread so startup never waits on either."""
+        def run() -> None:
+            self.warm_chains()
+            self.check_health(models)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def available_models(self) -> List[str]:
+        """Models worth calling right now, primary first. Models with an open circuit are skipped."""
+        if not self.api_key:
+            return []
+        return [
+            m for m in (PRIMARY_MODEL, FALLBACK_MODEL)
+            if self.breaker(m).is_available() and self.is_model_available(m) and self.get_llm(m) is not None
+        ]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        return self.circuit_breakers.get(self.api_key, model)
+
+    def acquire_model(self, model: str) -> None:
+        if not self.breaker(model).allow_request():
+            raise CircuitOpenError(f"Circuit for {model} is open")
+
+    def record_success(self, model: str, elapsed: float, max_tokens: Optional[int] = None,
+                       first_token: Optional[float] = None) -> None:
+        """
+        Record a finished call. A stream is judged by its time to first token;
+        other calls by their total time, against the long-call threshold when
+        they may write more than a section.
+        """
+        health_cache.set(self.api_key, model, True)
+        self.latencies.record(model, elapsed)
+        if first_token is not None:
+            self.breaker(model).record_success(first_token)
+        else:
+            long_call = (max_tokens or self.openrouter_config["max_tokens"]) > SECTION_MAX_TOKENS
+            self.breaker(model).record_success(elapsed, long_call=long_call)
+
+    def record_failure(self, model: str, error: BaseException) -> None:
+        # Provider failures feed the circuit breaker, which decides from the
+        # failure rate whether to stop sending traffic to the model; a request
+        # the provider rejected (bad key, bad input) only gives back its slot
+        if is_provider_error(error):
+            self.breaker(model).record_failure()
+        else:
+            self.breaker(model).release()
+
+    def invoke_model(self, prompt: str, model: str, input_data: Dict[str, Any], max_tokens: Optional[int] = None, raw: bool = False) -> Any:
+        """
+        Call one model, recording its health and latency. Returns the stripped
+        text, or the model's message when raw is set. Raises on failure.
+        """
+        self.acquire_model(model)
+        chain = self.chains.get(prompt, model, self.get_llm(model), max_tokens, raw)
+        start = time.perf_counter()
         try:
-            self.primary_llm = ChatOpenAI(
-                model="deepseek/deepseek-chat",  # Updated model name format
-                **openrouter_config
-            )
-            # Test the primary LLM with a simple call
-            test_prompt = ChatPromptTemplate.from_template("Say 'test' if you can respond.")
-            test_chain = test_prompt | self.primary_llm | StrOutputParser()
-            test_response = test_chain.invoke({"input": "test"})
-            print(f"Primary LLM test successful: {test_response}")
+            response = chain.invoke(input_data)
+            if not raw:
+                response = response.strip()
         except Exception as e:
-            print(f"Primary LLM failed: {e}")
-            self.primary_llm = None
+            print(f"{model} failed: {e}")
+            self.record_failure(model, e)
+            raise
+        self.record_success(model, time.perf_counter() - start, max_tokens)
+        return response
+
+    def get_llm_response(self, prompt: str, input_data: Dict[str, Any], use_cache: bool = True, max_tokens: Optional[int] = None) -> str:
+        if use_cache:
+            cached = self.response_cache.get_first(prompt, [PRIMARY_MODEL, FALLBACK_MODEL], input_data)
+            if cached is not None:
+                return cached
+
+        models = self.available_models()
+        if not models:
+            return "Error: No available LLM models"
 
         try:
-            self.fallback_llm = ChatOpenAI(
-                model="deepseek/deepseek-coder",  # Updated model name format
-                **openrouter_config
-            )
-            # Test the fallback LLM
-            if not self.primary_llm:
-                test_prompt = ChatPromptTemplate.from_template("Say 'test' if you can respond.")
-                test_chain = test_prompt | self.fallback_llm | StrOutputParser()
-                test_response = test_chain.invoke({"input": "test"})
-                print(f"Fallback LLM test successful: {test_response}")
+            if self.hedging and len(models) > 1:
+                response, model = self.invoke_hedged(prompt, models[0], models[1], input_data, max_tokens)
+            else:
+                response, model = self.invoke_in_order(prompt, models, input_data, max_tokens)
         except Exception as e:
-            print(f"Fallback LLM failed: {e}")
-            self.fallback_llm = None
-
-        if not self.primary_llm and not self.fallback_llm:
-            raise ValueError("Both OpenRouter LLMs failed to initialize. Check your API key and network connection.")
-
-    def get_llm_response(self, prompt: str, input_data: Dict[str, Any]) -> str:
-        formatted_prompt = ChatPromptTemplate.from_template(prompt)
-        parser = StrOutputParser()
-        
-        # Try primary LLM first
-        if self.primary_llm:
+            return f"Error: Both LLMs failed. Last error: {e}"
+
+        if use_cache and response:
+            self.response_cache.set(prompt, model, input_data, response)
+        return response
+
+    def invoke_in_order(self, prompt: str, models: List[str], input_data: Dict[str, Any], max_tokens: Optional[int] = None) -> Tuple[str, str]:
+        # Try primary LLM first, then the fallback. Each real call doubles as a
+        # health check so the next request can skip a model that is down.
+        last_error = None
+        for model in models:
             try:
-                chain = formatted_prompt | self.primary_llm | parser
-                response = chain.invoke(input_data)
-                return response.strip()
+                return self.invoke_model(prompt, model, input_data, max_tokens), model
             except Exception as e:
-                print(f"Primary LLM failed: {e}")
-                
-        # Try fallback LLM
-        if self.fallback_llm:
+                last_error = e
+        raise last_error
+
+    def invoke_hedged(self, prompt: str, primary: str, fallback: str, input_data: Dict[str, Any], max_tokens: Optional[int] = None) -> Tuple[str, str]:
+        """
+        Start the primary and, if it hasn't answered within the hedge delay (or
+        has already failed), start the fallback too. The first good answer wins.
+        """
+        start = time.perf_counter()
+        hedge_delay = self.hedging.delay(self.latencies, primary)
+        primary_future = hedge_executor.submit(self.invoke_model, prompt, primary, input_data, max_tokens)
+        done, _ = wait([primary_future], timeout=hedge_delay)
+        if done and primary_future.exception() is None:
+            return primary_future.result(), primary
+
+        hedged = not done
+        if hedged:
+            self.hedging.record_fired()
+        futures = {primary_future: primary, hedge_executor.submit(self.invoke_model, prompt, fallback, input_data, max_tokens): fallback}
+        pending = set(futures)
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                # The loser is abandoned: cancelled if it hasn't started, otherwise ignored
+                for other in pending:
+                    other.cancel()
+                model = futures[future]
+                if hedged and model == fallback:
+                    self.hedging.record_won(self.estimate_latency_saved(primary, hedge_delay, time.perf_counter() - start))
+                return future.result(), model
+        raise last_error
+
+    def estimate_latency_saved(self, primary: str, hedge_delay: float, elapsed: float) -> float:
+        """
+        Expected primary latency given it was slower than the hedge delay, minus
+        how long the winning hedge actually took.
+        """
+        expected = self.latencies.mean_above(primary, hedge_delay)
+        return max(0.0, expected - elapsed) if expected is not None else 0.0
+
+    def stream_llm_response(self, prompt: str, input_data: Dict[str, Any], use_cache: bool = True) -> Iterator[str]:
+        """
+        Yield response chunks from the first available model. A model that fails
+        before producing output is skipped in favour of the next one; a failure
+        after output has started is raised, since the text can't be spliced.
+        """
+        if use_cache:
+            cached = self.response_cache.get_first(prompt, [PRIMARY_MODEL, FALLBACK_MODEL], input_data)
+            if cached is not None:
+                yield cached
+                return
+
+        last_error = None
+
+        for model in self.available_models():
+            llm = self.get_llm(model)
             try:
-                chain = formatted_prompt | self.fallback_llm | parser
-                response = chain.invoke(input_data)
-                return response.strip()
+                self.acquire_model(model)
+            except CircuitOpenError as e:
+                last_error = e
+                continue
+            chunks = []
+            start = time.perf_counter()
+            first_token = None
+            try:
+                chain = self.chains.get(prompt, model, llm)
+                for chunk in chain.stream(input_data):
+                    if chunk:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        chunks.append(chunk)
+                        yield chunk
+                elapsed = time.perf_counter() - start
+                self.record_success(model, elapsed, first_token=elapsed if first_token is None else first_token)
+                response = "".join(chunks).strip()
+                if use_cache and response:
+                    self.response_cache.set(prompt, model, input_data, response)
+                return
+            except GeneratorExit:
+                # The consumer stopped reading; don't hold a half-open probe slot
+                self.breaker(model).release()
+                raise
             except Exception as e:
-                print(f"Fallback LLM failed: {e}")
-                return f"Error: Both LLMs failed. Last error: {e}"
-        
-        return "Error: No available LLM models"
-
-    def create_graph(self) -> StateGraph:
-        workflow = StateGraph(AgentState)
-        workflow.add_node("identify_document", self.identify_document_type)
-        workflow.add_node("ask_question", self.ask_question)
-        workflow.add_node("process_answer", self.process_answer)
-        workflow.add_node("generate_document", self.generate_document)
+                print(f"{model} failed while streaming: {e}")
+                self.record_failure(model, e)
+                if chunks:
+                    raise
+                last_error = e
+
+        if last_error is not None:
+            raise RuntimeError(f"Both LLMs failed. Last error: {last_error}")
+        raise RuntimeError("No available LLM models")
+
+    async def ainvoke_model(self, prompt: str, model: str, input_data: Dict[str, Any], max_tokens: Optional[int] = None, raw: bool = False) -> Any:
+        """Async counterpart of invoke_model built on ainvoke."""
+        self.acquire_model(model)
+        chain = self.chains.get(prompt, model, self.get_llm(model), max_tokens, raw)
+        start = time.perf_counter()
+        try:
+            response = await chain.ainvoke(input_data)
+            if not raw:
+                response = response.strip()
+        except asyncio.CancelledError:
+            self.breaker(model).release()
+            raise
+        except Exception as e:
+            print(f"{model} failed: {e}")
+            self.record_failure(model, e)
+            raise
+        self.record_success(model, time.perf_counter() - start, max_tokens)
+        return response
+
+    async def aget_llm_response(self, prompt: str, input_data: Dict[str, Any], use_cache: bool = True, max_tokens: Optional[int] = None) -> str:
+        """Async counterpart of get_llm_response built on ainvoke."""
+        if use_cache:
+            cached = await self.response_cache.aget_first(prompt, [PRIMARY_MODEL, FALLBACK_MODEL], input_data)
+            if cached is not None:
+                return cached
+
+        models = self.available_models()
+        if not models:
+            return "Error: No available LLM models"
+
+        try:
+            if self.hedging and len(models) > 1:
+                response, model = await self.ainvoke_hedged(prompt, models[0], models[1], input_data, max_tokens)
+            else:
+                response, model = await self.ainvoke_in_order(prompt, models, input_data, max_tokens)
+        except Exception as e:
+            return f"Error: Both LLMs failed. Last error: {e}"
+
+        if use_cache and response:
+            await self.response_cache.aset(prompt, model, input_data, response)
+        return response
+
+    async def ainvoke_in_order(self, prompt: str, models: List[str], input_data: Dict[str, Any], max_tokens: Optional[int] = None) -> Tuple[str, str]:
+        last_error = None
+        for model in models:
+            try:
+                return await self.ainvoke_model(prompt, model, input_data, max_tokens), model
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    async def ainvoke_hedged(self, prompt: str, primary: str, fallback: str, input_data: Dict[str, Any], max_tokens: Optional[int] = None) -> Tuple[str, str]:
+        """Async counterpart of invoke_hedged; the losing request is cancelled."""
+        start = time.perf_counter()
+        hedge_delay = self.hedging.delay(self.latencies, primary)
+        primary_task = asyncio.ensure_future(self.ainvoke_model(prompt, primary, input_data, max_tokens))
+        done, _ = await asyncio.wait([primary_task], timeout=hedge_delay)
+        if done and primary_task.exception() is None:
+            return primary_task.result(), primary
+
+        hedged = not done
+        if hedged:
+            self.hedging.record_fired()
+        tasks = {primary_task: primary, asyncio.ensure_future(self.ainvoke_model(prompt, fallback, input_data, max_tokens)): fallback}
+        pending = set(tasks)
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    model = tasks[task]
+                    if hedged and model == fallback:
+                        self.hedging.record_won(self.estimate_latency_saved(primary, hedge_delay, time.perf_counter() - start))
+                    return task.result(), model
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error
+
+    async def astream_llm_response(self, prompt: str, input_data: Dict[str, Any], use_cache: bool = True) -> AsyncIterator[str]:
+        """Async counterpart of stream_llm_response built on astream."""
+        if use_cache:
+            cached = await self.response_cache.aget_first(prompt, [PRIMARY_MODEL, FALLBACK_MODEL], input_data)
+            if cached is not None:
+                yield cached
+                return
+
+        last_error = None
+
+        for model in self.available_models():
+            llm = self.get_llm(model)
+            try:
+                self.acquire_model(model)
+            except CircuitOpenError as e:
+                last_error = e
+                continue
+            chunks = []
+            start = time.perf_counter()
+            first_token = None
+            try:
+                chain = self.chains.get(prompt, model, llm)
+                async for chunk in chain.astream(input_data):
+                    if chunk:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        chunks.append(chunk)
+                        yield chunk
+                elapsed = time.perf_counter() - start
+                self.record_success(model, elapsed, first_token=elapsed if first_token is None else first_token)
+                response = "".join(chunks).strip()
+                if use_cache and response:
+                    await self.response_cache.aset(prompt, model, input_data, response)
+                return
+            except (GeneratorExit, asyncio.CancelledError):
+                # The consumer stopped reading; don't hold a half-open probe slot
+                self.breaker(model).release()
+                raise
+            except Exception as e:
+                print(f"{model} failed while streaming: {e}")
+                self.record_failure(model, e)
+                if chunks:
+                    raise
+                last_error = e
+
+        if last_error is not None:
+            raise RuntimeError(f"Both LLMs failed. Last error: {last_error}")
+        raise RuntimeError("No available LLM models")
+
+    def get_llm_message(self, prompt: str, input_data: Dict[str, Any], max_tokens: Optional[int] = None) -> AIMessage:
+        """Like get_llm_response but returns the raw message, so callers can see why generation stopped."""
+        last_error = None
+        for model in self.available_models():
+            try:
+                return self.invoke_model(prompt, model, input_data, max_tokens, raw=True)
+            except Exception as e:
+                last_error = e
+        raise last_error or RuntimeError("No available LLM models")
+
+    async def aget_llm_message(self, prompt: str, input_data: Dict[str, Any], max_tokens: Optional[int] = None) -> AIMessage:
+        last_error = None
+        for model in self.available_models():
+            try:
+                return await self.ainvoke_model(prompt, model, input_data, max_tokens, raw=True)
+            except Exception as e:
+                last_error = e
+        raise last_error or RuntimeError("No available LLM models")
+
+    def draft_with_continuation(self, prompt: str, input_data: Dict[str, Any], max_tokens: int = LONG_SECTION_MAX_TOKENS) -> str:
+        """Generate text and keep asking for more while the model stops on its token limit."""
+        message = self.get_llm_message(prompt, input_data, max_tokens)
+        text = message.content
+        for _ in range(MAX_CONTINUATIONS):
+            if not is_truncated(message):
+                break
+            continuation = {"document_type": input_data.get("document_type", ""), "text_so_far": text}
+            message = self.get_llm_message(CONTINUATION_PROMPT, continuation, max_tokens)
+            text += message.content
+        return text.strip()
+
+    async def adraft_with_continuation(self, prompt: str, input_data: Dict[str, Any], max_tokens: int = LONG_SECTION_MAX_TOKENS) -> str:
+        message = await self.aget_llm_message(prompt, input_data, max_tokens)
+        text = message.content
+        for _ in range(MAX_CONTINUATIONS):
+            if not is_truncated(message):
+                break
+            continuation = {"document_type": input_data.get("document_type", ""), "text_so_far": text}
+            message = await self.aget_llm_message(CONTINUATION_PROMPT, continuation, max_tokens)
+            text += message.content
+        return text.strip()
+
+    def create_graph(self, use_async: bool = False) -> StateGraph:
+        workflow = StateGraph(GraphState)
+        if use_async:
+            workflow.add_node("identify_document", self.aidentify_document_type)
+            workflow.add_node("ask_question", self.aask_question)
+            workflow.add_node("process_answer", self.aprocess_answer)
+            workflow.add_node("generate_document", self.agenerate_document)
+        else:
+            workflow.add_node("identify_document", self.identify_document_type)
+            workflow.add_node("ask_question", self.ask_question)
+            workflow.add_node("process_answer", self.process_answer)
+            workflow.add_node("generate_document", self.generate_document)
         workflow.add_node("handle_error", self.handle_error)
         workflow.set_entry_point("identify_document")
         workflow.add_conditional_edges(
@@ -153,54 +738,74 @@ class LegalDocumentAgent:
         return workflow.compile()
 
     def identify_document_type(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        user_input = state.get("user_input", "").lower().strip()
         if state.get("document_type"):
             return state
-        # Canonical mapping for document types and aliases
-        type_map = {
-            "nda": "nda",
-            "non-disclosure agreement": "nda",
-            "contract": "contract",
-            "service agreement": "contract",
-            "employment contract": "contract",
-            "employment agreement": "contract",
-            "lease": "lease",
-            "lease agreement": "lease",
-            "rental agreement": "lease",
-            "residential lease agreement": "lease"
-        }
-        canonical_type = None
-        for k, v in type_map.items():
-            if k in user_input:
-                canonical_type = v
-                break
-        if not canonical_type:
-            # Try to match by partial words (e.g., 'lease', 'nda', 'contract')
-            for k, v in type_map.items():
-                if any(word in user_input for word in k.split()):
-                    canonical_type = v
-                    break
-        if not canonical_type:
+        user_input = state.get("user_input", "").strip()
+        result = get_document_classifier().classify(user_input)
+        if result.confidence < LLM_FALLBACK_THRESHOLD:
+            result = self.classify_with_llm(user_input, result)
+        return self.apply_classification(state, result)
+
+    def classify_with_llm(self, user_input: str, local: Classification) -> Classification:
+        """
+        Ask the LLM (through the response cache) when the local match is weak,
+        keeping the local guess if the model's answer isn't a clear document type.
+        """
+        response = self.get_llm_response(DOCUMENT_IDENTIFICATION_PROMPT, {"user_input": user_input})
+        return self.read_llm_classification(response, local)
+
+    def read_llm_classification(self, response: str, local: Classification) -> Classification:
+        """
+        Accept only a bare document type or alias from the LLM. Any other
+        reply, such as the clarifying question the prompt allows, is unclear
+        and leaves the local result; searching it for aliases would read
+        "an NDA, Employment Agreement, or something else?" as a contract.
+        """
+        if not response or response.lower().startswith("error"):
+            return local
+        document_type = get_document_classifier().lookup(LLM_TYPE_LABEL.sub("", response.strip()))
+        if document_type:
+            return Classification(document_type, 1.0, "llm")
+        return local
+
+    def apply_classification(self, state: Dict[str, Any], result: Classification) -> Dict[str, Any]:
+        if not result.document_type or result.confidence < MIN_CONFIDENCE:
             state["current_question"] = (
                 "Could you please specify the type of document you want to create? "
                 "(NDA, Contract, or Lease Agreement)"
             )
             return state
-        state["document_type"] = canonical_type
+        state["document_type"] = result.document_type
+        questionnaire = get_questionnaire(result.document_type)
+        state["answered_mask"] = self.prefill_fields(state, questionnaire, state.get("user_input", ""), self.questionnaire_mask(state, questionnaire))
         return state
 
+    def questionnaire_mask(self, state: Dict[str, Any], questionnaire: Questionnaire) -> int:
+        """The state's progress mask, rebuilt from collected_info for states that predate it."""
+        mask = state.get("answered_mask", 0)
+        if not mask and state.get("collected_info"):
+            mask = questionnaire.mask_for(state["collected_info"])
+        return mask
+
     def ask_question(self, state: Dict[str, Any]) -> Dict[str, Any]:
         document_type = state.get("document_type", "")
         collected_info = state.get("collected_info", {})
-        questions = get_questions_for_document(document_type)
-        # Ask all questions (required and optional) in order
-        missing_fields = [f for f in questions if f not in collected_info]
-        if not missing_fields:
+        questionnaire = get_questionnaire(document_type)
+        # Ask all questions (required and optional) in order, skipping those whose conditions fail
+        next_field, mask = questionnaire.next_field(self.questionnaire_mask(state, questionnaire), collected_info)
+        state["answered_mask"] = mask
+        if next_field is None:
             state["is_complete"] = True
             return state
-        next_field = missing_fields[0]
-        question_config = questions[next_field]
+        question_config = questionnaire.configs[next_field]
         base_question = question_config["question"]
+        if self.conversational_questions:
+            # Never wait on the model here: serve a ready phrasing or the plain question,
+            # and have the next few questions phrased while the user answers
+            answered = [f for f in questionnaire.fields if questionnaire.bits[f] & mask]
+            base_question = self.question_phrasings.get(phrasing_key(document_type, next_field, answered)) or base_question
+            self.prefetch_questions(document_type, questionnaire, mask, answered)
+        state["current_field"] = next_field
         if question_config.get("examples"):
             examples_text = f"\nFor example: {', '.join(question_config['examples'][:3])}"
             state["current_question"] = base_question + examples_text
@@ -208,28 +813,76 @@ class LegalDocumentAgent:
             state["current_question"] = base_question
         return state
 
+    def prefetch_questions(self, document_type: str, questionnaire: Questionnaire, mask: int, answered: List[str]) -> int:
+        """
+        Queue phrasings for the next PREFETCH_QUESTIONS questions, each keyed by
+        the fields that will have been answered by then. Cached and in-flight
+        phrasings are skipped, so after the first session of a document type
+        this queues nothing. Returns how many were queued.
+        """
+        queued = 0
+        for field in questionnaire.pending_fields(mask, PREFETCH_QUESTIONS):
+            input_data = {
+                "document_type": document_type,
+                "collected_info": ", ".join(f.replace("_", " ") for f in answered) or "None",
+                "missing_info": f"{field.replace('_', ' ')}: {questionnaire.configs[field]['question']}"
+            }
+            generate = lambda input_data=input_data: self.get_llm_response(QUESTION_GENERATION_PROMPT, input_data)
+            queued += self.question_phrasings.schedule(phrasing_key(document_type, field, answered), generate)
+            answered = answered + [field]
+        return queued
+
+    def prefill_fields(self, state: Dict[str, Any], questionnaire: Questionnaire, text: str, mask: int,
+                       current_field: str = "") -> int:
+        """
+        Fill every unanswered field the text confidently gives a value for and
+        mark its question answered, so it is never asked. When the text is the
+        answer to current_field and also answers other questions, the current
+        field keeps only its own extracted part. Returns the updated mask.
+        """
+        if not self.extract_answers or not text:
+            return mask
+        answered = [field for field, bit in questionnaire.bits.items() if mask & bit and field != current_field]
+        prefilled = prefill_answers(get_answer_extractor(questionnaire.document_type).extract(text, skip=answered))
+        if current_field in prefilled and len(prefilled) == 1:
+            del prefilled[current_field]
+        collected_info = state.setdefault("collected_info", {})
+        extracted_fields = state.setdefault("extracted_fields", {})
+        for field, (value, confidence) in prefilled.items():
+            collected_info[field] = value
+            if field != current_field:
+                extracted_fields[field] = confidence
+            mask |= questionnaire.bits[field]
+        return mask
+
     def process_answer(self, state: Dict[str, Any]) -> Dict[str, Any]:
         document_type = state.get("document_type", "")
         collected_info = state.get("collected_info", {})
         current_question = state.get("current_question", "")
         user_input = state.get("user_input", "")
-        questions = get_questions_for_document(document_type)
-        for field, config in questions.items():
-            if config["question"] in current_question:
-                collected_info[field] = user_input
-                break
+        questionnaire = get_questionnaire(document_type)
+        mask = self.questionnaire_mask(state, questionnaire)
+        current_field = state.get("current_field", "")
+        if current_field in questionnaire.bits:
+            collected_info[current_field] = user_input
+            state["collected_info"] = collected_info
+            mask = self.prefill_fields(state, questionnaire, user_input, mask | questionnaire.bits[current_field], current_field)
         state["collected_info"] = collected_info
         state["conversation_history"].append({"question": current_question, "answer": user_input})
-        # Only complete when all questions (required and optional) are answered
-        missing_fields = [f for f in questions if f not in collected_info]
-        if not missing_fields:
+        # Only complete when every question that applies (required and optional) is answered
+        next_field, mask = questionnaire.next_field(mask, collected_info)
+        state["answered_mask"] = mask
+        if next_field is None:
             state["is_complete"] = True
+        else:
+            self.start_speculative_draft(state)
         return state
 
-    def generate_document(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def prepare_document_inputs(self, state: Dict[str, Any]) -> Tuple[Optional[CompiledTemplate], Dict[str, Any], Dict[str, Any]]:
+        """Return the compiled fallback template, the template fields and the LLM prompt input."""
         document_type = state.get("document_type", "")
         collected_info = state.get("collected_info", {})
-        template = get_template_for_document(document_type)
+        template = get_compiled_template(document_type)
         today = datetime.now().strftime("%B %d, %Y")
         collected_info["date"] = today
 
@@ -245,27 +898,516 @@ class LegalDocumentAgent:
             else:
                 collected_info["specific_exclusions_formatted"] = ""
 
-        # Try LLM-based document generation first
         llm_input = {
             "document_type": document_type,
             "collected_info": format_collected_info_for_display(collected_info),
             "date": today
         }
+        return template, collected_info, llm_input
+
+    def resolve_generation_mode(self, state: Dict[str, Any]) -> str:
+        mode = state.get("generation_mode") or self.generation_mode
+        if mode not in GENERATION_MODES:
+            raise ValueError(f"Unknown generation mode: {mode}. Expected one of {', '.join(GENERATION_MODES)}.")
+        return mode
+
+    def use_template_only(self, state: Dict[str, Any], template: Optional[CompiledTemplate], collected_info: Dict[str, Any]) -> bool:
+        """
+        "template" always fills the predefined template with no network I/O.
+        "hybrid" also does so when the document type has no prose sections, or
+        none of their source answers were given.
+        """
+        mode = self.resolve_generation_mode(state)
+        if mode == "template":
+            return True
+        if mode == "hybrid":
+            return not self.prose_section_jobs(state.get("document_type", ""), collected_info)
+        return False
+
+    def uses_llm(self, state: Dict[str, Any]) -> bool:
+        """Whether drafting this state calls the LLM, so a plain template result means the LLM failed."""
+        state = copy_state(state)
+        template, collected_info, _ = self.prepare_document_inputs(state)
+        if self.use_template_only(state, template, collected_info):
+            return False
+        if self.resolve_generation_mode(state) == "sections":
+            return template is not None and not template.missing_fields(collected_info)
+        return True
+
+    def prose_section_jobs(self, document_type: str, collected_info: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """(placeholder, prompt input) for every hybrid-mode section the LLM should draft."""
+        jobs = []
+        for placeholder, section in get_prose_sections(document_type).items():
+            value = collected_info.get(section["source"])
+            if not value:
+                continue
+            jobs.append((placeholder, {
+                "document_type": document_type,
+                "instruction": section["instruction"],
+                "value": value,
+                "collected_info": format_collected_info_for_display(
+                    {k: v for k, v in collected_info.items() if k in get_questions_for_document(document_type)}
+                )
+            }))
+        return jobs
+
+    def drafted_prose_values(self, jobs: List[Tuple[str, Dict[str, Any]]], results: List[Any]) -> Dict[str, str]:
+        """Template values for the prose sections that were drafted successfully."""
+        drafted = {}
+        for (placeholder, _), text in zip(jobs, results):
+            if not isinstance(text, str) or not text.strip() or text.lower().startswith("error"):
+                continue
+            text = text.strip()
+            drafted[placeholder] = text + "\n" if placeholder.endswith("_formatted") else text
+        return drafted
+
+    def merge_prose_sections(self, state: Dict[str, Any], template: Optional[CompiledTemplate], collected_info: Dict[str, Any],
+                             jobs: List[Tuple[str, Dict[str, Any]]], results: List[Any]) -> Dict[str, Any]:
+        """Render the template with each drafted section in place; failed sections keep the user's wording."""
+        drafted = self.drafted_prose_values(jobs, results)
+        state["drafted_prose"] = drafted
+        marker = HYBRID_DOCUMENT_MARKER if drafted else TEMPLATE_DOCUMENT_MARKER
+        return self.render_template_document(state, template, dict(collected_info, **drafted), marker)
+
+    def generate_hybrid_document(self, state: Dict[str, Any], template: Optional[CompiledTemplate], collected_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Template boilerplate with only the prose sections drafted by the LLM, concurrently."""
+        jobs = self.prose_section_jobs(state.get("document_type", ""), collected_info)
+        draft = RunnableLambda(lambda job: self.get_llm_response(SECTION_GENERATION_PROMPT, job, max_tokens=SECTION_MAX_TOKENS))
+        results = draft.batch([job for _, job in jobs], return_exceptions=True)
+        return self.merge_prose_sections(state, template, collected_info, jobs, results)
+
+    async def agenerate_hybrid_document(self, state: Dict[str, Any], template: Optional[CompiledTemplate], collected_info: Dict[str, Any]) -> Dict[str, Any]:
+        jobs = self.prose_section_jobs(state.get("document_type", ""), collected_info)
+        results = await asyncio.gather(
+            *(self.aget_llm_response(SECTION_GENERATION_PROMPT, job, max_tokens=SECTION_MAX_TOKENS) for _, job in jobs),
+            return_exceptions=True
+        )
+        return self.merge_prose_sections(state, template, collected_info, jobs, results)
+
+    def section_jobs(self, document_type: str, template: CompiledTemplate, collected_info: Dict[str, Any],
+                     sections: Optional[List[TemplateSection]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """(section key, prompt input) for every numbered section of the plan, or of the given sections."""
+        details = format_collected_info_for_display(
+            {k: v for k, v in collected_info.items() if k in get_questions_for_document(document_type)}
+        )
+        return [
+            (section.key, {
+                "document_type": document_type,
+                "section_heading": f"{section.number}. {section.title}",
+                "section_text": section.render(collected_info).strip(),
+                "collected_info": details
+            })
+            for section in (plan_sections(template) if sections is None else sections) if section.is_numbered
+        ]
+
+    def draft_sections(self, jobs: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, str]:
+        """Draft the given sections in parallel; sections that fail are left out."""
+        draft = RunnableLambda(lambda job: self.draft_with_continuation(SECTION_DRAFTING_PROMPT, job))
+        results = draft.batch([job for _, job in jobs], config={"max_concurrency": max(1, len(jobs))}, return_exceptions=True)
+        return {key: text for (key, _), text in zip(jobs, results) if isinstance(text, str) and text.strip()}
+
+    async def adraft_sections(self, jobs: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, str]:
+        results = await asyncio.gather(
+            *(self.adraft_with_continuation(SECTION_DRAFTING_PROMPT, job) for _, job in jobs),
+            return_exceptions=True
+        )
+        return {key: text for (key, _), text in zip(jobs, results) if isinstance(text, str) and text.strip()}
+
+    def stitch_sections(self, state: Dict[str, Any], template: CompiledTemplate, collected_info: Dict[str, Any],
+                        drafted: Dict[str, str]) -> Dict[str, Any]:
+        """Join the plan in order, using drafted text where it succeeded and the template elsewhere."""
+        sections = render_sections(template, collected_info)
+        sections.update({key: text + "\n\n" for key, text in drafted.items()})
+        state["document_sections"] = sections
+        state["final_document"] = "".join(sections.values()) + (SECTIONS_DOCUMENT_MARKER if drafted else TEMPLATE_DOCUMENT_MARKER)
+        state["is_complete"] = True
+        return state
+
+    def generate_sectioned_document(self, state: Dict[str, Any], template: Optional[CompiledTemplate], collected_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Draft every numbered section in parallel, each with its own token budget
+        and automatic continuation, then stitch them between the template's
+        preamble and signature block. Wall-clock time follows the longest section.
+        """
+        if template is None or template.missing_fields(collected_info):
+            return self.render_template_document(state, template, collected_info)
+        jobs = self.section_jobs(state.get("document_type", ""), template, collected_info)
+        return self.stitch_sections(state, template, collected_info, self.draft_sections(jobs))
+
+    async def agenerate_sectioned_document(self, state: Dict[str, Any], template: Optional[CompiledTemplate], collected_info: Dict[str, Any]) -> Dict[str, Any]:
+        if template is None or template.missing_fields(collected_info):
+            return self.render_template_document(state, template, collected_info)
+        jobs = self.section_jobs(state.get("document_type", ""), template, collected_info)
+        return self.stitch_sections(state, template, collected_info, await self.adraft_sections(jobs))
+
+    def render_template_document(self, state: Dict[str, Any], template: Optional[CompiledTemplate], collected_info: Dict[str, Any],
+                                 marker: str = TEMPLATE_DOCUMENT_MARKER) -> Dict[str, Any]:
+        """Fallback: fill the predefined template with the collected information."""
+        if template is None:
+            state["error_message"] = f"Error generating document: no template for document type '{state.get('document_type', '')}'"
+            return state
+        try:
+            sections = render_sections(template, collected_info)
+        except Exception as e:
+            state["error_message"] = f"Error generating document: {e}"
+            return state
+        state["document_sections"] = sections
+        state["final_document"] = "".join(sections.values()) + marker
+        state["is_complete"] = True
+        return state
+
+    def plan_answer_update(self, state: Dict[str, Any], answers: Dict[str, Any]) -> Optional[Tuple[CompiledTemplate, Dict[str, Any], Set[str]]]:
+        """
+        Store edited answers and work out which template values they change,
+        by comparing every placeholder before and after the edit (so derived
+        fields such as formatted addresses are covered). Returns None when the
+        draft has no section map, e.g. an LLM document written in one call,
+        and has to be generated again in full.
+        """
+        source = document_source(state.get("final_document", ""))
+        patchable = source in ("template", "hybrid", "sections") and bool(state.get("document_sections"))
+        old_values = self.prepare_document_inputs(copy_state(state))[1] if patchable else {}
+        state.setdefault("collected_info", {}).update(answers)
+        for field in answers:
+            state.get("extracted_fields", {}).pop(field, None)
+        if not patchable:
+            return None
+        template, values, _ = self.prepare_document_inputs(state)
+        if template is None or template.missing_fields(values):
+            return None
+        return template, values, {p for p in template.placeholders if old_values.get(p) != values.get(p)}
+
+    def changed_prose_jobs(self, state: Dict[str, Any], values: Dict[str, Any], changed: Set[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Hybrid prose placeholders whose source answer changed; their old drafts are dropped."""
+        state["drafted_prose"] = {p: text for p, text in state.get("drafted_prose", {}).items() if p not in changed}
+        return [job for job in self.prose_section_jobs(state.get("document_type", ""), values) if job[0] in changed]
+
+    def patch_sections(self, state: Dict[str, Any], template: CompiledTemplate, values: Dict[str, Any],
+                       affected: List[TemplateSection], drafted: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Replace the affected sections in the stored draft and rebuild final_document."""
+        drafted = drafted or {}
+        values = dict(values, **state.get("drafted_prose", {}))
+        sections = dict(state["document_sections"])
+        for section in affected:
+            sections[section.key] = drafted[section.key] + "\n\n" if section.key in drafted else section.render(values)
+        marker = DOCUMENT_MARKERS[document_source(state["final_document"])]
+        state["document_sections"] = sections
+        state["final_document"] = "".join(sections[section.key] for section in plan_sections(template)) + marker
+        state["error_message"] = ""
+        return state
+
+    def update_answer(self, state: Dict[str, Any], field: str, value: Any) -> Dict[str, Any]:
+        return self.update_answers(state, {field: value})
+
+    def update_answers(self, state: Dict[str, Any], answers: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Change answers after the document has been drafted and patch only the
+        sections that use them. Template sections are re-rendered, hybrid
+        prose and "sections"-mode sections are re-drafted by the LLM, and the
+        rest of the document is reused, so an edit costs in proportion to
+        what it touches.
+        """
+        plan = self.plan_answer_update(state, answers)
+        if plan is None:
+            return self.draft_document(state)
+        template, values, changed = plan
+        affected = affected_sections(template, changed)
+        source = document_source(state["final_document"])
+        if source == "hybrid":
+            jobs = self.changed_prose_jobs(state, values, changed)
+            draft = RunnableLambda(lambda job: self.get_llm_response(SECTION_GENERATION_PROMPT, job, max_tokens=SECTION_MAX_TOKENS))
+            state["drafted_prose"].update(self.drafted_prose_values(jobs, draft.batch([job for _, job in jobs], return_exceptions=True)))
+            return self.patch_sections(state, template, values, affected)
+        if source == "sections":
+            jobs = self.section_jobs(state.get("document_type", ""), template, values, affected)
+            return self.patch_sections(state, template, values, affected, self.draft_sections(jobs))
+        return self.patch_sections(state, template, values, affected)
+
+    def start_speculative_draft(self, state: Dict[str, Any]) -> bool:
+        """
+        Start drafting in the background as soon as every required field is
+        known, while the optional questions are still being asked, and apply
+        each later answer to that draft in the background as it arrives. Only
+        modes whose drafts can be patched section by section (hybrid and
+        sections) speculate; a template render is instant, and a one-call LLM
+        draft would have to be thrown away once the optional answers arrive.
+        """
+        session_id = state.get("session_id", "")
+        if not self.speculative_drafting or not session_id or state.get("is_complete"):
+            return False
+        mode = self.resolve_generation_mode(state)
+        if mode not in SPECULATIVE_MODES:
+            return False
+        questionnaire = get_questionnaire(state.get("document_type", ""))
+        if questionnaire.missing_required(self.questionnaire_mask(state, questionnaire)):
+            return False
+        snapshot = copy_state(state)
+        with self._speculative_lock:
+            self.evict_speculative_drafts()
+            entry = self._speculative_drafts.get(session_id)
+            if entry is None or entry.mode != mode:
+                if entry is not None:
+                    entry.close()
+                entry = SpeculativeDraft(mode, speculative_executor, self.advance_speculative_draft)
+            self._speculative_drafts[session_id] = entry
+            self._speculative_drafts.move_to_end(session_id)
+        entry.update(snapshot)
+        return True
+
+    def advance_speculative_draft(self, previous: Optional[Dict[str, Any]], state: Dict[str, Any]) -> Dict[str, Any]:
+        """Next version of a speculative draft: the previous one with the answers given since."""
+        if previous is None:
+            return self.draft_document(state)
+        answers = self.answers_since_draft(state, previous)
+        if answers is None:
+            return self.draft_document(state)
+        return self.update_answers(copy_state(previous), answers) if answers else previous
+
+    def evict_speculative_drafts(self) -> None:
+        """Drop drafts of sessions abandoned before generation, making room for one more. Called with the lock held."""
+        now = time.monotonic()
+        while self._speculative_drafts:
+            session_id, entry = next(iter(self._speculative_drafts.items()))
+            if len(self._speculative_drafts) < MAX_SPECULATIVE_DRAFTS and now - entry.updated_at <= SPECULATIVE_DRAFT_TTL:
+                break
+            del self._speculative_drafts[session_id]
+            entry.close()
+
+    def take_speculative_draft(self, state: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Future]]:
+        """
+        End the session's speculative draft, cancelling the links not yet
+        started. Returns its newest finished version, or, when none has
+        finished, the link still running to wait for; (None, None) without
+        a usable draft.
+        """
+        with self._speculative_lock:
+            entry = self._speculative_drafts.pop(state.get("session_id", ""), None)
+        if entry is None:
+            return None, None
+        running = entry.close()
+        if entry.mode != self.resolve_generation_mode(state):
+            return None, None
+        draft = entry.latest()
+        return draft, (running if draft is None else None)
+
+    def answers_since_draft(self, state: Dict[str, Any], draft: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Answers given since the draft started, or None if the draft can't be used."""
+        if draft.get("error_message") or not draft.get("document_sections") or draft.get("document_type") != state.get("document_type"):
+            return None
+        drafted_info = draft.get("collected_info", {})
+        collected_info = state.get("collected_info", {})
+        return {
+            field: collected_info[field]
+            for field in get_questions_for_document(state.get("document_type", ""))
+            if field in collected_info and drafted_info.get(field) != collected_info[field]
+        }
+
+    def adopt_draft(self, state: Dict[str, Any], draft: Dict[str, Any]) -> Dict[str, Any]:
+        for key in ("collected_info", "final_document", "document_sections", "drafted_prose", "is_complete", "error_message"):
+            state[key] = draft.get(key, state.get(key))
+        return state
+
+    def generate_document(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Use the session's speculative draft when there is one. Its newest
+        finished version is taken without waiting for an update still in
+        flight, and the answers it doesn't have yet (usually just the last
+        one) are rendered from the template rather than redrafted, so the
+        document is ready without another LLM round trip. Otherwise draft
+        from scratch.
+        """
+        draft, running = self.take_speculative_draft(state)
+        if running is not None:
+            try:
+                draft = running.result()
+            except Exception as e:
+                print(f"Speculative draft failed, drafting again: {e}")
+        if draft is not None:
+            answers = self.answers_since_draft(state, draft)
+            if answers is not None:
+                return self.adopt_draft(state, self.render_answers(copy_state(draft), answers) if answers else draft)
+        return self.draft_document(state)
+
+    def render_answers(self, state: Dict[str, Any], answers: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply answers to a drafted document by re-rendering the sections they
+        touch from the template, with no LLM calls; a hybrid prose passage
+        they change keeps the user's wording, as when its draft fails.
+        """
+        plan = self.plan_answer_update(state, answers)
+        if plan is None:
+            return self.draft_document(state)
+        template, values, changed = plan
+        self.changed_prose_jobs(state, values, changed)
+        return self.patch_sections(state, template, values, affected_sections(template, changed))
+
+    def draft_document(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        template, collected_info, llm_input = self.prepare_document_inputs(state)
+        if self.use_template_only(state, template, collected_info):
+            return self.render_template_document(state, template, collected_info)
+        if self.resolve_generation_mode(state) == "hybrid":
+            return self.generate_hybrid_document(state, template, collected_info)
+        if self.resolve_generation_mode(state) == "sections":
+            return self.generate_sectioned_document(state, template, collected_info)
+
+        # Try LLM-based document generation first
         llm_result = self.get_llm_response(DOCUMENT_GENERATION_PROMPT, llm_input)
         if llm_result and not llm_result.lower().startswith("error"):
-            state["final_document"] = llm_result + "\n\n[Generated by LLM (OpenRouter DeepSeek)]"
+            state["final_document"] = llm_result + LLM_DOCUMENT_MARKER
             state["is_complete"] = True
             return state
 
-        # Fallback: use template formatting
+        return self.render_template_document(state, template, collected_info)
+
+    def generate_documents(self, states: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Generate many documents at once through LangChain's batch machinery.
+        Each item gets the same LLM-then-template fallback as generate_document;
+        results keep the input order, and an item that raises is returned with
+        error_message set instead of failing the whole batch.
+        """
+        runnable = RunnableLambda(self.generate_document)
+        inputs = [copy_state(state) for state in states]
+        results = runnable.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        return [batch_result(state, result) for state, result in zip(inputs, results)]
+
+    def stream_document(self, state: Dict[str, Any]) -> Iterator[str]:
+        """
+        Streaming variant of generate_document. Yields document chunks as they
+        arrive and fills in state["final_document"] once the stream ends. If the
+        stream fails, the final document falls back to the template, so callers
+        should re-render from the state after the generator is exhausted.
+        """
+        if self.resolve_generation_mode(state) != "llm":
+            # Template-based modes finish in one step, so the document arrives as a single chunk
+            self.generate_document(state)
+            if state.get("final_document"):
+                yield strip_document_marker(state["final_document"])
+            return
+        template, collected_info, llm_input = self.prepare_document_inputs(state)
+        chunks = []
         try:
-            document = template.format(**collected_info)
+            for chunk in self.stream_llm_response(DOCUMENT_GENERATION_PROMPT, llm_input):
+                chunks.append(chunk)
+                yield chunk
         except Exception as e:
-            state["error_message"] = f"Error generating document: {e}"
+            print(f"Streaming generation failed, using template: {e}")
+            chunks = []
+
+        llm_result = "".join(chunks).strip()
+        if llm_result:
+            state["final_document"] = llm_result + LLM_DOCUMENT_MARKER
+            state["is_complete"] = True
+            return
+        self.render_template_document(state, template, collected_info)
+
+    async def aidentify_document_type(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if state.get("document_type"):
             return state
-        state["final_document"] = document + "\n\n[Generated by predefined template]"
-        state["is_complete"] = True
-        return state
+        user_input = state.get("user_input", "").strip()
+        result = get_document_classifier().classify(user_input)
+        if result.confidence < LLM_FALLBACK_THRESHOLD:
+            response = await self.aget_llm_response(DOCUMENT_IDENTIFICATION_PROMPT, {"user_input": user_input})
+            result = self.read_llm_classification(response, result)
+        return self.apply_classification(state, result)
+
+    # The questionnaire nodes do no I/O, so their async versions simply delegate
+
+    async def aask_question(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return self.ask_question(state)
+
+    async def aprocess_answer(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return self.process_answer(state)
+
+    async def agenerate_document(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        draft, running = self.take_speculative_draft(state)
+        if running is not None:
+            try:
+                draft = await asyncio.wrap_future(running)
+            except Exception as e:
+                print(f"Speculative draft failed, drafting again: {e}")
+        if draft is not None:
+            answers = self.answers_since_draft(state, draft)
+            if answers is not None:
+                return self.adopt_draft(state, self.render_answers(copy_state(draft), answers) if answers else draft)
+        return await self.adraft_document(state)
+
+    async def adraft_document(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        template, collected_info, llm_input = self.prepare_document_inputs(state)
+        if self.use_template_only(state, template, collected_info):
+            return self.render_template_document(state, template, collected_info)
+        if self.resolve_generation_mode(state) == "hybrid":
+            return await self.agenerate_hybrid_document(state, template, collected_info)
+        if self.resolve_generation_mode(state) == "sections":
+            return await self.agenerate_sectioned_document(state, template, collected_info)
+
+        llm_result = await self.aget_llm_response(DOCUMENT_GENERATION_PROMPT, llm_input)
+        if llm_result and not llm_result.lower().startswith("error"):
+            state["final_document"] = llm_result + LLM_DOCUMENT_MARKER
+            state["is_complete"] = True
+            return state
+
+        return self.render_template_document(state, template, collected_info)
+
+    async def agenerate_documents(self, states: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Async counterpart of generate_documents built on abatch."""
+        runnable = RunnableLambda(self.generate_document, afunc=self.agenerate_document)
+        inputs = [copy_state(state) for state in states]
+        results = await runnable.abatch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        return [batch_result(state, result) for state, result in zip(inputs, results)]
+
+    async def astream_document(self, state: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async counterpart of stream_document."""
+        if self.resolve_generation_mode(state) != "llm":
+            # Template-based modes finish in one step, so the document arrives as a single chunk
+            await self.agenerate_document(state)
+            if state.get("final_document"):
+                yield strip_document_marker(state["final_document"])
+            return
+        template, collected_info, llm_input = self.prepare_document_inputs(state)
+        chunks = []
+        try:
+            async for chunk in self.astream_llm_response(DOCUMENT_GENERATION_PROMPT, llm_input):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"Streaming generation failed, using template: {e}")
+            chunks = []
+
+        llm_result = "".join(chunks).strip()
+        if llm_result:
+            state["final_document"] = llm_result + LLM_DOCUMENT_MARKER
+            state["is_complete"] = True
+            return
+        self.render_template_document(state, template, collected_info)
+
+    async def aupdate_answer(self, state: Dict[str, Any], field: str, value: Any) -> Dict[str, Any]:
+        return await self.aupdate_answers(state, {field: value})
+
+    async def aupdate_answers(self, state: Dict[str, Any], answers: Dict[str, Any]) -> Dict[str, Any]:
+        """Async counterpart of update_answers."""
+        plan = self.plan_answer_update(state, answers)
+        if plan is None:
+            return await self.adraft_document(state)
+        template, values, changed = plan
+        affected = affected_sections(template, changed)
+        source = document_source(state["final_document"])
+        if source == "hybrid":
+            jobs = self.changed_prose_jobs(state, values, changed)
+            results = await asyncio.gather(
+                *(self.aget_llm_response(SECTION_GENERATION_PROMPT, job, max_tokens=SECTION_MAX_TOKENS) for _, job in jobs),
+                return_exceptions=True
+            )
+            state["drafted_prose"].update(self.drafted_prose_values(jobs, results))
+            return self.patch_sections(state, template, values, affected)
+        if source == "sections":
+            jobs = self.section_jobs(state.get("document_type", ""), template, values, affected)
+            return self.patch_sections(state, template, values, affected, await self.adraft_sections(jobs))
+        return self.patch_sections(state, template, values, affected)
+
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the compiled async graph on a single event loop."""
+        return await self.async_graph.ainvoke(state)
 
     def handle_error(self, state: Dict[str, Any]) -> Dict[str, Any]:
         state["error_message"] = state.get("error_message", "Unknown error.")
@@ -0,0 +1,55 @@
+"""
+LLM Health Tracking for the Legal Document Drafting Agent
+Remembers per-key, per-model health results for a limited time so agents
+don't have to probe the provider every time one is constructed.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+DEFAULT_HEALTH_TTL = 300.0
+# Failures are retried sooner so a transient error doesn't disable a model for long
+DEFAULT_FAILURE_TTL = 30.0
+
+
+def fingerprint_api_key(api_key: str) -> str:
+    """Return a short, non-reversible identifier for an API key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class HealthCache:
+    """Thread-safe store of model health results with a TTL."""
+    def __init__(self, ttl: float = DEFAULT_HEALTH_TTL, failure_ttl: float = DEFAULT_FAILURE_TTL):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._results: Dict[Tuple[str, str], Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str, model: str) -> Optional[bool]:
+        """Return the cached health of a model, or None if unknown or expired."""
+        key = (fingerprint_api_key(api_key), model)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            healthy, checked_at = entry
+            ttl = self.ttl if healthy else self.failure_ttl
+            if time.monotonic() - checked_at > ttl:
+                del self._results[key]
+                return None
+            return healthy
+
+    def set(self, api_key: str, model: str, healthy: bool) -> None:
+        key = (fingerprint_api_key(api_key), model)
+        with self._lock:
+            self._results[key] = (healthy, time.monotonic())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+
+# Shared by every agent in the process so a key is only probed once per TTL
+health_cache = HealthCache()
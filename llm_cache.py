@@ -0,0 +1,250 @@
+"""
+LLM Response Cache for the Legal Document Drafting Agent
+An in-memory LRU with size and TTL bounds, backed by one JSON file per entry
+on disk so cached responses survive restarts. The disk copy is bounded too:
+by the same TTL and by max_disk_entries files.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = "Experiments/llm_cache"
+DEFAULT_MAX_SIZE = 256
+DEFAULT_TTL = 24 * 60 * 60.0
+DEFAULT_MAX_DISK_ENTRIES = 2048
+# A prune leaves the directory at this fraction of max_disk_entries
+PRUNE_TO = 0.9
+
+
+def normalize_input(value: Any) -> Any:
+    """Normalize prompt input so trivially different answers share a cache entry."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {str(k): normalize_input(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize_input(v) for v in value]
+    return value
+
+
+def make_cache_key(prompt: str, model: str, input_data: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"prompt": prompt, "model": model, "input": normalize_input(input_data)},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of LLM responses keyed by prompt, model and input.
+
+    Disk reads and writes happen outside the lock, so a slow disk never holds
+    up lookups answered from memory; aget_first and aset run them in the
+    default executor so they don't block the event loop. Cached drafts hold
+    party details, so the directory and its files are readable by the owner
+    only, expired entries are deleted when found, and the directory is pruned
+    back to max_disk_entries, oldest first.
+    """
+    def __init__(self, storage_dir: Optional[str] = DEFAULT_CACHE_DIR, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL,
+                 max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.storage_dir = Path(storage_dir) if storage_dir else None
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Files on disk as of the last prune plus those written since; None until the first write scans the directory
+        self._disk_entries: Optional[int] = None
+        self._pruning = False
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _entry_path(self, key: str) -> Path:
+        return self.storage_dir / f"{key}.json"
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return time.time() - created_at <= self.ttl
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        self._entries[key] = (response, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, float]]:
+        """A fresh entry from disk; expired and corrupt entries are treated as misses and removed."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            response, created_at = entry["response"], float(entry["created_at"])
+        except FileNotFoundError:
+            return None
+        except Exception:
+            path.unlink(missing_ok=True)
+            return None
+        if not self._is_fresh(created_at):
+            path.unlink(missing_ok=True)
+            return None
+        return response, created_at
+
+    def _get_memory(self, keys: List[str]) -> Optional[str]:
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry and self._is_fresh(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                if entry:
+                    del self._entries[key]
+            if not self.storage_dir:
+                self.misses += 1
+            return None
+
+    def _get_disk(self, keys: List[str]) -> Optional[str]:
+        for key in keys:
+            entry = self._read_disk(key)
+            if entry:
+                with self._lock:
+                    self._remember(key, *entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return entry[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get(self, prompt: str, model: str, input_data: Dict[str, Any]) -> Optional[str]:
+        return self.get_first(prompt, [model], input_data)
+
+    def get_first(self, prompt: str, models: List[str], input_data: Dict[str, Any]) -> Optional[str]:
+        """Return the cached response of the first model that has one, counting one hit or miss."""
+        keys = [make_cache_key(prompt, model, input_data) for model in models]
+        response = self._get_memory(keys)
+        if response is None and self.storage_dir:
+            response = self._get_disk(keys)
+        return response
+
+    async def aget_first(self, prompt: str, models: List[str], input_data: Dict[str, Any]) -> Optional[str]:
+        """get_first for coroutines: a memory hit answers inline, the disk is read in the executor."""
+        keys = [make_cache_key(prompt, model, input_data) for model in models]
+        response = self._get_memory(keys)
+        if response is None and self.storage_dir:
+            response = await asyncio.get_running_loop().run_in_executor(None, self._get_disk, keys)
+        return response
+
+    def _write_disk(self, key: str, model: str, response: str, created_at: float) -> None:
+        if self._disk_entries is None:
+            self.storage_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            try:
+                # A directory made before entries were private
+                self.storage_dir.chmod(0o700)
+            except OSError:
+                pass
+        # A private temp file per writer, renamed into place so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.storage_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"response": response, "created_at": created_at, "model": model}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            if self._pruning:
+                return
+            prune = self._disk_entries is None or self._disk_entries + 1 > self.max_disk_entries
+            if not prune:
+                self._disk_entries += 1
+                return
+            self._pruning = True
+        try:
+            remaining = self.prune_disk()
+        finally:
+            with self._lock:
+                self._pruning = False
+        with self._lock:
+            self._disk_entries = remaining
+
+    def prune_disk(self) -> int:
+        """
+        Delete expired entries and, beyond PRUNE_TO of max_disk_entries, the
+        oldest ones, so pruning runs once per batch of writes rather than per
+        write. Returns how many entries are left.
+        """
+        if not self.storage_dir or not self.storage_dir.exists():
+            return 0
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.storage_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                modified = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - modified > self.ttl:
+                Path(entry.path).unlink(missing_ok=True)
+            else:
+                entries.append((modified, entry.path))
+        keep = int(self.max_disk_entries * PRUNE_TO)
+        if len(entries) > self.max_disk_entries:
+            entries.sort()
+            for _, path in entries[:len(entries) - keep]:
+                Path(path).unlink(missing_ok=True)
+            return keep
+        return len(entries)
+
+    def set(self, prompt: str, model: str, input_data: Dict[str, Any], response: str) -> None:
+        key = make_cache_key(prompt, model, input_data)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, response, created_at)
+        if self.storage_dir:
+            self._write_disk(key, model, response, created_at)
+
+    async def aset(self, prompt: str, model: str, input_data: Dict[str, Any], response: str) -> None:
+        """set for coroutines: the disk write runs in the executor."""
+        key = make_cache_key(prompt, model, input_data)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, response, created_at)
+        if self.storage_dir:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_disk, key, model, response, created_at)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._disk_entries = None
+        if self.storage_dir:
+            for path in self.storage_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "disk_entries": self._disk_entries or 0
+            }
+
+
+# Shared by every agent in the process
+response_cache = ResponseCache()
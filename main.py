@@ -2,7 +2,8 @@ import streamlit as st
 import os
 import uuid
 from datetime import datetime
-from graph import LegalDocumentAgent, AgentState
+from graph import LegalDocumentAgent, AgentState, document_source, strip_document_marker
+from prompt_templates import get_questions_for_document
 
 # Page Configuration
 st.set_page_config(
@@ -369,10 +370,29 @@ with st.sidebar:
     
     if st.button("New Session", use_container_width=True):
         for key in list(st.session_state.keys()):
-            if key not in ['api_key', 'agent', 'agent_initialized']:
+            if key not in ['api_key', 'agent', 'agent_initialized', 'generation_mode', 'conversational_questions']:
                 del st.session_state[key]
         st.rerun()
     
+    st.markdown("### Generation Mode")
+    st.selectbox(
+        "Generation Mode",
+        options=["llm", "sections", "hybrid", "template"],
+        format_func=lambda mode: {
+            "llm": "AI drafting (LLM)",
+            "sections": "AI drafting section by section (long documents)",
+            "hybrid": "Hybrid (template with AI-drafted clauses)",
+            "template": "Standard template (instant, offline)"
+        }[mode],
+        key="generation_mode",
+        label_visibility="collapsed"
+    )
+    st.checkbox(
+        "Conversational questions",
+        key="conversational_questions",
+        help="Questions are phrased by the AI in the background; the standard wording is used until a phrasing is ready."
+    )
+    
     st.markdown("### Session Information")
     if 'session_id' in st.session_state:
         st.text(f"Session ID: {st.session_state.session_id[:8]}...")
@@ -423,7 +443,7 @@ def show_api_setup():
     if api_key:
         os.environ["OPENROUTER_API_KEY"] = api_key
         st.session_state.api_key = api_key
-        st.session_state.agent = LegalDocumentAgent()
+        st.session_state.agent = LegalDocumentAgent(api_key=api_key, health_check="background")
         st.session_state.agent_initialized = True
         
         st.markdown("""
@@ -434,6 +454,18 @@ def show_api_setup():
         
         st.rerun()
 
+def announce_extracted_fields(state_dict, known_before):
+    """Tell the user which answers were picked up from their message, so they can correct them."""
+    extracted = state_dict.get("extracted_fields", {})
+    new_fields = [field for field in extracted if field not in known_before]
+    if new_fields:
+        collected_info = state_dict.get("collected_info", {})
+        lines = [f"- {field.replace('_', ' ').title()}: {collected_info.get(field, '')}" for field in new_fields]
+        st.session_state.chat_history.append({
+            "role": "ai",
+            "content": "I picked these up from your message (edit them under \"Edit an Answer\" if needed):\n" + "\n".join(lines)
+        })
+
 # Check API Key
 if "agent_initialized" not in st.session_state or not st.session_state.get("api_key"):
     show_api_setup()
@@ -452,6 +484,8 @@ if "progress" not in st.session_state:
     st.session_state.progress = 0
 
 agent = st.session_state.agent
+agent.generation_mode = st.session_state.get("generation_mode", "llm")
+agent.conversational_questions = st.session_state.get("conversational_questions", False)
 
 # Welcome Screen
 if not st.session_state.chat_history:
@@ -505,14 +539,23 @@ if not st.session_state.chat_history:
         state_dict = agent.identify_document_type(state_dict)
         st.session_state.state_dict = state_dict
         st.session_state.chat_history.append({"role": "user", "content": user_input})
+        announce_extracted_fields(state_dict, set())
         st.session_state.progress = 20
         
         # Ask first question
         state_dict = agent.ask_question(state_dict)
+        if state_dict.get("is_complete", False):
+            # The request itself answered every question
+            state_dict = agent.generate_document(state_dict)
+            st.session_state.progress = 100
+            st.session_state.chat_history.append({
+                "role": "ai",
+                "content": "---\n**Generated Legal Document**\n" + state_dict.get("final_document", "[No document generated]")
+            })
         st.session_state.state_dict = state_dict
         question = state_dict.get("current_question", "")
         
-        if question:
+        if question and not state_dict.get("is_complete", False):
             st.session_state.chat_history.append({"role": "ai", "content": question})
         
         st.rerun()
@@ -579,12 +622,24 @@ if st.session_state.chat_history:
             # Process the answer
             st.session_state.chat_history.append({"role": "user", "content": answer})
             st.session_state.state_dict["user_input"] = answer
+            known_before = set(st.session_state.state_dict.get("extracted_fields", {}))
             st.session_state.state_dict = agent.process_answer(st.session_state.state_dict)
+            announce_extracted_fields(st.session_state.state_dict, known_before)
             st.session_state.progress = min(st.session_state.progress + 15, 90)
             
             # Check if complete
             if st.session_state.state_dict.get("is_complete", False):
-                st.session_state.state_dict = agent.generate_document(st.session_state.state_dict)
+                # Render the document progressively as the LLM streams it
+                st.markdown("""
+                <div class="document-header">
+                    <div class="document-title">Drafting Document...</div>
+                </div>
+                """, unsafe_allow_html=True)
+                stream_placeholder = st.empty()
+                streamed = ""
+                for chunk in agent.stream_document(st.session_state.state_dict):
+                    streamed += chunk
+                    stream_placeholder.code(streamed, language="text")
                 st.session_state.progress = 100
                 
                 document = st.session_state.state_dict.get("final_document", "[No document generated]")
@@ -613,17 +668,18 @@ if st.session_state.chat_history:
                 <strong>Error:</strong> {error_message}
             </div>
             """, unsafe_allow_html=True)
-        elif "[Generated by LLM" in document:
-            st.markdown("""
+        elif document_source(document) == "llm" or (document_source(document) and agent.generation_mode != "llm"):
+            source = {"llm": "AI-Generated", "sections": "AI-Generated by Section", "hybrid": "Template with AI-Drafted Clauses", "template": "Template-Generated"}[document_source(document)]
+            st.markdown(f"""
             <div class="document-container">
                 <div class="document-header">
                     <div class="document-title">Generated Legal Document</div>
-                    <div class="document-subtitle">AI-Generated • Ready for Review</div>
+                    <div class="document-subtitle">{source} • Ready for Review</div>
                 </div>
             </div>
             """, unsafe_allow_html=True)
             
-            clean_doc = document.replace("\n\n[Generated by LLM (OpenRouter DeepSeek)]", "").strip()
+            clean_doc = strip_document_marker(document)
             
             st.code(clean_doc, language="text")
             
@@ -640,9 +696,23 @@ if st.session_state.chat_history:
             with col2:
                 if st.button("Create New Document", use_container_width=True):
                     for key in list(st.session_state.keys()):
-                        if key not in ['api_key', 'agent', 'agent_initialized']:
+                        if key not in ['api_key', 'agent', 'agent_initialized', 'generation_mode', 'conversational_questions']:
                             del st.session_state[key]
                     st.rerun()
+            
+            with st.expander("Edit an Answer"):
+                state_dict = st.session_state.state_dict
+                questions = get_questions_for_document(state_dict.get("document_type", ""))
+                field = st.selectbox(
+                    "Field",
+                    options=list(questions),
+                    format_func=lambda f: f.replace("_", " ").title()
+                )
+                new_value = st.text_input("New answer", value=str(state_dict.get("collected_info", {}).get(field, "")), key=f"edit_{field}")
+                if st.button("Update Document", use_container_width=True) and new_value.strip():
+                    with st.spinner("Updating the affected sections..."):
+                        st.session_state.state_dict = agent.update_answer(state_dict, field, new_value.strip())
+                    st.rerun()
         else:
             st.markdown("""
             <div class="status-message status-warning">
@@ -1,18 +1,40 @@
 """
 Session Memory Management for Conversational Legal Document Drafting Agent
+Sessions are cached in memory. Reads never touch storage once a session is
+cached, and updates only mark it dirty; dirty sessions are written back in a
+batch every flush_interval seconds, on flush() and at interpreter shutdown.
+Storage is pluggable (see session_store.py): a directory of JSON files by
+default, or a SQLite database when storage_dir ends in .db.
+
+A session that doesn't exist yet lives only in memory until its first
+meaningful update, so looking a session up never creates an empty file.
+session_gc.py sweeps the empty and abandoned sessions already on disk.
+
+Use get_session_manager() to share one manager per directory: two managers
+on the same directory keep separate caches, session indexes and journal
+sequences, and would overwrite each other's sessions.
 """
 
-import json
+import atexit
 import os
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime
-from pathlib import Path
+
+from session_gc import DEFAULT_ABANDONED_AFTER_DAYS, collect_sessions, is_empty_session
+from session_store import SessionStore, open_session_store, persisted_values
+
+DEFAULT_STORAGE_DIR = "Experiments/session_data"
+DEFAULT_FLUSH_INTERVAL = 5.0
+# Clean sessions beyond this many are dropped from memory, least recently used first
+DEFAULT_MAX_CACHED = 1024
 
 class SessionMemoryManager:
     """Manages session-based memory for the legal document drafting agent."""
-    def __init__(self, storage_dir: str = "Experiments/session_data"):
-        self.storage_dir = Path(storage_dir)
-        self.storage_dir.mkdir(parents=True, exist_ok=True)
+    def __init__(self, storage_dir: str = DEFAULT_STORAGE_DIR, flush_interval: Optional[float] = DEFAULT_FLUSH_INTERVAL,
+                 max_cached: int = DEFAULT_MAX_CACHED, store: Optional[SessionStore] = None):
+        self.store = store if store is not None else open_session_store(storage_dir)
         self.default_session = {
             "session_id": "",
             "created_at": "",
@@ -24,50 +46,192 @@ class SessionMemoryManager:
             "is_complete": False,
             "final_document": ""
         }
-
-    def get_session_file_path(self, session_id: str) -> Path:
-        return self.storage_dir / f"session_{session_id}.json"
+        # None writes every save straight through to disk
+        self.flush_interval = flush_interval
+        self.max_cached = max_cached
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        # Sessions created in memory and not stored yet
+        self._unstored: Set[str] = set()
+        # Sessions taken by a flush in progress; like dirty ones they stay cached until written
+        self._flushing: Set[str] = set()
+        self._lock = threading.RLock()
+        # Serializes flushes (and deletes against them) so an older batch never lands after a newer one
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
 
     def create_session(self, session_id: str) -> Dict[str, Any]:
+        """A new, empty session. It is only stored once a save gives it some content."""
         session_data = self.default_session.copy()
+        session_data["collected_info"] = {}
+        session_data["conversation_history"] = []
         session_data["session_id"] = session_id
         session_data["created_at"] = datetime.now().isoformat()
         session_data["last_updated"] = datetime.now().isoformat()
-        self.save_session(session_id, session_data)
+        with self._lock:
+            self._unstored.add(session_id)
+            self.remember(session_id, session_data)
         return session_data
 
     def get_session(self, session_id: str) -> Dict[str, Any]:
-        session_file = self.get_session_file_path(session_id)
-        if not session_file.exists():
-            return self.create_session(session_id)
-        try:
-            with open(session_file, 'r', encoding='utf-8') as f:
-                session_data = json.load(f)
-            session_data["last_updated"] = datetime.now().isoformat()
-            self.save_session(session_id, session_data)
+        """
+        The session's data, from memory when cached and otherwise read once
+        from storage. Reading never writes: last_updated only changes on save.
+        The returned dict is the cached one, so changes must go through
+        save_session or update_session to be persisted.
+        """
+        with self._lock:
+            session_data = self._sessions.get(session_id)
+            if session_data is not None:
+                self._sessions.move_to_end(session_id)
+                return session_data
+            session_data = self.store.load(session_id)
+            if session_data is None:
+                return self.create_session(session_id)
+            self.remember(session_id, session_data)
             return session_data
-        except Exception:
-            return self.create_session(session_id)
+
+    def remember(self, session_id: str, session_data: Dict[str, Any]) -> None:
+        self._sessions[session_id] = session_data
+        self._sessions.move_to_end(session_id)
+        if len(self._sessions) > self.max_cached:
+            # Only clean sessions can be dropped; dirty ones wait for the next flush
+            for cached_id in list(self._sessions):
+                if len(self._sessions) <= self.max_cached:
+                    break
+                if cached_id not in self._dirty and cached_id not in self._flushing and cached_id != session_id:
+                    del self._sessions[cached_id]
+                    self._unstored.discard(cached_id)
 
     def save_session(self, session_id: str, session_data: Dict[str, Any]) -> None:
-        session_file = self.get_session_file_path(session_id)
         session_data["last_updated"] = datetime.now().isoformat()
-        with open(session_file, 'w', encoding='utf-8') as f:
-            json.dump(session_data, f, indent=2, ensure_ascii=False)
+        with self._lock:
+            self.remember(session_id, session_data)
+            if session_id in self._unstored:
+                if is_empty_session(session_data):
+                    return
+                self._unstored.discard(session_id)
+            if self.flush_interval is None:
+                self.store.save(session_id, session_data)
+                self._dirty.discard(session_id)
+                return
+            self._dirty.add(session_id)
+            self.start_flusher()
 
     def update_session(self, session_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
-        session_data = self.get_session(session_id)
-        session_data.update(updates)
-        self.save_session(session_id, session_data)
-        return session_data
+        with self._lock:
+            session_data = self.get_session(session_id)
+            session_data.update(updates)
+            self.save_session(session_id, session_data)
+            return session_data
 
     def delete_session(self, session_id: str) -> bool:
-        session_file = self.get_session_file_path(session_id)
-        if session_file.exists():
-            os.remove(session_file)
-            return True
-        return False
-
-    def list_sessions(self) -> list:
-        session_files = list(self.storage_dir.glob("session_*.json"))
-        return [f.stem.replace("session_", "") for f in session_files] 
\ No newline at end of file
+        with self._flush_lock, self._lock:
+            cached = self._sessions.pop(session_id, None) is not None
+            self._dirty.discard(session_id)
+            self._unstored.discard(session_id)
+            return self.store.delete(session_id) or cached
+
+    def list_sessions(self, limit: Optional[int] = None, offset: int = 0) -> list:
+        """Session ids; with a limit, one page of them, most recently updated first."""
+        if limit is not None or offset:
+            return self.find_sessions(limit=limit, offset=offset)
+        with self._lock:
+            unsaved = [session_id for session_id in self._dirty if not self.store.exists(session_id)]
+        return self.store.list_ids() + unsaved
+
+    def find_sessions(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None,
+                      updated_after: Optional[str] = None, updated_before: Optional[str] = None,
+                      limit: Optional[int] = None, offset: int = 0) -> List[str]:
+        """Ids of matching sessions, most recently updated first; pending changes are flushed first."""
+        self.flush()
+        return self.store.query(document_type=document_type, is_complete=is_complete, updated_after=updated_after,
+                                updated_before=updated_before, limit=limit, offset=offset)
+
+    def collect_garbage(self, abandoned_after_days: Optional[float] = DEFAULT_ABANDONED_AFTER_DAYS,
+                        dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Remove stored sessions that are empty or abandoned (see
+        session_gc.collect_sessions) and report them. Sessions saved since
+        the flush that starts the sweep are newer than what is stored, so
+        they are kept.
+        """
+        self.flush()
+        with self._flush_lock, self._lock:
+            report = collect_sessions(self.store, abandoned_after_days, dry_run, keep=set(self._dirty))
+            if not dry_run:
+                for session_id in report["empty"] + report["abandoned"]:
+                    self._sessions.pop(session_id, None)
+                    self._dirty.discard(session_id)
+                    self._unstored.discard(session_id)
+            return report
+
+    def flush(self) -> int:
+        """
+        Write every dirty session to disk in one batch. Returns how many were
+        written. The sessions are copied under the lock and written outside
+        it, so reads and saves never wait on the disk; if the write fails
+        they are marked dirty again for the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                # A session deleted while dirty has nothing left to write
+                dirty = {session_id: persisted_values(self._sessions[session_id])
+                         for session_id in self._dirty if session_id in self._sessions}
+                self._flushing = set(dirty)
+                self._dirty.clear()
+            try:
+                self.store.save_many(dirty)
+            except Exception:
+                with self._lock:
+                    self._dirty.update(session_id for session_id in dirty if session_id in self._sessions)
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = set()
+        return len(dirty)
+
+    def start_flusher(self) -> None:
+        """Start the background flush loop on the first dirty session."""
+        if self._flusher is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.wait(self.flush_interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Session flush failed: {e}")
+
+        self._flusher = threading.Thread(target=run, name="session-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Stop the flush loop and write what is still dirty."""
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cached": len(self._sessions),
+                "dirty": len(self._dirty),
+                "store_reads": self.store.reads,
+                "store_writes": self.store.writes
+            }
+
+
+_shared_managers: Dict[str, SessionMemoryManager] = {}
+_shared_lock = threading.Lock()
+
+
+def get_session_manager(storage_dir: str = DEFAULT_STORAGE_DIR) -> SessionMemoryManager:
+    """The process-wide manager for storage_dir, created on first use."""
+    key = os.path.realpath(storage_dir)
+    with _shared_lock:
+        manager = _shared_managers.get(key)
+        if manager is None:
+            manager = _shared_managers[key] = SessionMemoryManager(storage_dir)
+        return manager
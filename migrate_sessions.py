@@ -0,0 +1,53 @@
+"""
+Session Migration
+Copies every session from one store to another, e.g. the JSON session files
+into a SQLite database. Sessions are written in batches, one transaction per
+batch for SQLite. Existing sessions in the target are replaced, so a run
+that was interrupted can simply be started again.
+
+Usage: python migrate_sessions.py Experiments/session_data Experiments/sessions.db --batch-size 1000
+"""
+
+import argparse
+import time
+from typing import Any, Dict
+
+from session_store import SessionStore, open_session_store
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def migrate_sessions(source: SessionStore, target: SessionStore, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Copy every readable session from source to target. Returns how many were copied."""
+    batch: Dict[str, Dict[str, Any]] = {}
+    copied = 0
+    for session_id, session_data in source.iter_sessions():
+        session_data.setdefault("session_id", session_id)
+        batch[session_id] = session_data
+        if len(batch) >= batch_size:
+            target.save_many(batch)
+            copied += len(batch)
+            batch = {}
+    target.save_many(batch)
+    return copied + len(batch)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Copy sessions between storage backends.")
+    parser.add_argument("source", help="Session directory or SQLite database (.db) to read")
+    parser.add_argument("target", help="Session directory or SQLite database (.db) to write")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Sessions per write batch")
+    args = parser.parse_args()
+
+    source, target = open_session_store(args.source), open_session_store(args.target)
+    listed = len(source.list_ids())
+    start = time.perf_counter()
+    copied = migrate_sessions(source, target, args.batch_size)
+    print(f"Copied {copied} of {listed} sessions in {time.perf_counter() - start:.1f}s "
+          f"({listed - copied} unreadable sessions skipped)")
+    source.close()
+    target.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Conversational Question Phrasing for the Legal Document Drafting Agent
+LLM-phrased versions of the questionnaire, generated in the background and
+served from memory so asking a question never waits on the model.
+
+Phrasings are keyed by document type, field and the set of fields already
+answered (never their values), so one phrasing serves every session that
+reaches the same point of the questionnaire.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+# (document type, field, fields already answered)
+PhrasingKey = Tuple[str, str, FrozenSet[str]]
+
+# Phrasing calls are small and never on the user's critical path
+question_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="question-phrasing")
+
+
+def phrasing_key(document_type: str, field: str, answered: Iterable[str]) -> PhrasingKey:
+    return (document_type, field, frozenset(answered))
+
+
+def clean_phrasing(text: str) -> str:
+    """Strip the quotes and labels models like to wrap a single question in."""
+    text = text.strip()
+    for prefix in ("Question:", "Next question:"):
+        if text.lower().startswith(prefix.lower()):
+            text = text[len(prefix):].strip()
+    return text.strip('"\'“” ')
+
+
+class QuestionPhrasings:
+    """LRU of phrased questions plus the set of phrasings still being generated."""
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._phrasings: "OrderedDict[PhrasingKey, str]" = OrderedDict()
+        self._pending: Set[PhrasingKey] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: PhrasingKey) -> Optional[str]:
+        with self._lock:
+            phrasing = self._phrasings.get(key)
+            if phrasing is None:
+                self.misses += 1
+                return None
+            self._phrasings.move_to_end(key)
+            self.hits += 1
+            return phrasing
+
+    def set(self, key: PhrasingKey, phrasing: str) -> None:
+        with self._lock:
+            self._phrasings[key] = phrasing
+            self._phrasings.move_to_end(key)
+            while len(self._phrasings) > self.max_size:
+                self._phrasings.popitem(last=False)
+
+    def schedule(self, key: PhrasingKey, generate: Callable[[], str]) -> bool:
+        """Generate a phrasing in the background unless it is cached or already on its way."""
+        with self._lock:
+            if key in self._phrasings or key in self._pending:
+                return False
+            self._pending.add(key)
+
+        def run() -> None:
+            try:
+                phrasing = clean_phrasing(generate() or "")
+                if phrasing and not phrasing.lower().startswith("error"):
+                    self.set(key, phrasing)
+            except Exception as e:
+                print(f"Question phrasing failed for {key[1]}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        question_executor.submit(run)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._phrasings.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._phrasings),
+                "pending": len(self._pending)
+            }
+
+
+question_phrasings = QuestionPhrasings()
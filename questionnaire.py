@@ -0,0 +1,138 @@
+"""
+Compiled Questionnaires
+Each document type's questions compiled once into an ordered plan. Progress
+is a bitmask over that plan (bit i set = question i answered or skipped), so
+finding the next question, checking completion and counting missing required
+fields are integer operations instead of scans over the question dict.
+
+A question becomes conditional with an "ask_if" entry in its config, e.g.
+    "ask_if": {"field": "contract_type", "in": ["Service Agreement"]}
+Supported tests are "equals", "in", "not_in" and "present". The tested field
+must come earlier in the questionnaire; when the test fails the question is
+skipped and counts as done.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from document_registry import document_registry
+from prompt_templates import get_questions_for_document
+
+CONDITION_TESTS = ("equals", "in", "not_in", "present")
+
+
+class QuestionnaireError(ValueError):
+    """Raised when a questionnaire's conditions can't be compiled."""
+
+
+def normalize_answer(value: Any) -> str:
+    return " ".join(str(value).split()).lower()
+
+
+class Questionnaire:
+    """The questions of one document type, in asking order, with their bit positions."""
+    __slots__ = ("document_type", "fields", "configs", "bits", "required_mask", "full_mask", "conditions")
+
+    def __init__(self, document_type: str, questions: Dict[str, Dict[str, Any]]):
+        self.document_type = document_type
+        self.fields: Tuple[str, ...] = tuple(questions)
+        self.configs = dict(questions)
+        self.bits: Dict[str, int] = {field: 1 << i for i, field in enumerate(self.fields)}
+        self.full_mask = (1 << len(self.fields)) - 1
+        self.required_mask = 0
+        self.conditions: Dict[str, Dict[str, Any]] = {}
+        for field, config in questions.items():
+            if config.get("required", False):
+                self.required_mask |= self.bits[field]
+            if config.get("ask_if"):
+                self.conditions[field] = self.compile_condition(field, config["ask_if"])
+
+    def compile_condition(self, field: str, condition: Dict[str, Any]) -> Dict[str, Any]:
+        tested = condition.get("field")
+        if tested not in self.bits or self.bits[tested] >= self.bits[field]:
+            raise QuestionnaireError(f"Question {field} of {self.document_type} depends on {tested}, which is not asked before it")
+        tests = [test for test in CONDITION_TESTS if test in condition]
+        if len(tests) != 1:
+            raise QuestionnaireError(f"Question {field} of {self.document_type} needs exactly one of {', '.join(CONDITION_TESTS)}")
+        test = tests[0]
+        expected = condition[test]
+        if test in ("in", "not_in"):
+            expected = frozenset(normalize_answer(v) for v in expected)
+        elif test == "equals":
+            expected = normalize_answer(expected)
+        else:
+            expected = bool(expected)
+        return {"field": tested, "test": test, "expected": expected}
+
+    def should_ask(self, field: str, collected_info: Dict[str, Any]) -> bool:
+        condition = self.conditions.get(field)
+        if condition is None:
+            return True
+        value = collected_info.get(condition["field"])
+        present = value not in (None, "")
+        test, expected = condition["test"], condition["expected"]
+        if test == "present":
+            return present == expected
+        if not present:
+            return False
+        if test == "equals":
+            return normalize_answer(value) == expected
+        if test == "in":
+            return normalize_answer(value) in expected
+        return normalize_answer(value) not in expected
+
+    def mask_for(self, collected_info: Dict[str, Any]) -> int:
+        """Mask of the answered questions, for states that don't carry one yet."""
+        mask = 0
+        for field in collected_info:
+            mask |= self.bits.get(field, 0)
+        return mask
+
+    def next_field(self, mask: int, collected_info: Dict[str, Any]) -> Tuple[Optional[str], int]:
+        """
+        The next question to ask and the updated mask, with any questions whose
+        conditions fail marked done on the way. Unconditional questionnaires
+        find the answer in one step.
+        """
+        remaining = self.full_mask & ~mask
+        while remaining:
+            lowest = remaining & -remaining
+            field = self.fields[lowest.bit_length() - 1]
+            if self.should_ask(field, collected_info):
+                return field, mask
+            mask |= lowest
+            remaining ^= lowest
+        return None, mask
+
+    def is_complete(self, mask: int) -> bool:
+        return mask & self.full_mask == self.full_mask
+
+    def missing_required(self, mask: int) -> List[str]:
+        missing = self.required_mask & ~mask
+        return [field for field, bit in self.bits.items() if missing & bit]
+
+    def pending_fields(self, mask: int, limit: Optional[int] = None) -> List[str]:
+        """Unanswered questions in asking order, at most limit of them."""
+        pending = []
+        remaining = self.full_mask & ~mask
+        while remaining and (limit is None or len(pending) < limit):
+            lowest = remaining & -remaining
+            pending.append(self.fields[lowest.bit_length() - 1])
+            remaining ^= lowest
+        return pending
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def __repr__(self) -> str:
+        return f"Questionnaire({self.document_type!r}, {len(self.fields)} questions)"
+
+
+@lru_cache(maxsize=64)
+def get_questionnaire(document_type: str) -> Questionnaire:
+    """Compiled questionnaire for a document type; unknown types get an empty one."""
+    document_type = document_type.lower()
+    return Questionnaire(document_type, get_questions_for_document(document_type))
+
+
+document_registry.on_reload(get_questionnaire.cache_clear)
@@ -0,0 +1,253 @@
+"""
+Resilience helpers for the Legal Document Drafting Agent
+Latency tracking, hedged requests and circuit breakers for the OpenRouter models.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from health import fingerprint_api_key
+
+# Worker pool for hedged calls; threads can't be interrupted, so a losing call
+# runs to completion here and its result is discarded
+hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies per model."""
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[model].append(seconds)
+
+    def count(self, model: str) -> int:
+        with self._lock:
+            return len(self._samples[model])
+
+    def percentile(self, model: str, percentile: float) -> Optional[float]:
+        """Nearest-rank percentile of the recorded latencies, or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples[model])
+        if not samples:
+            return None
+        rank = max(0, min(len(samples) - 1, int(round(percentile / 100 * len(samples))) - 1))
+        return samples[rank]
+
+    def mean_above(self, model: str, threshold: float) -> Optional[float]:
+        """Mean of the recorded latencies slower than threshold, or None if there are none."""
+        with self._lock:
+            slow = [sample for sample in self._samples[model] if sample > threshold]
+        return sum(slow) / len(slow) if slow else None
+
+
+class HedgingPolicy:
+    """
+    Decides when to fire a hedge request to the fallback model and keeps count
+    of how hedging performs. The delay is the chosen percentile of the primary
+    model's recent latency, or default_delay until enough samples exist.
+    """
+    def __init__(self, percentile: float = 95.0, default_delay: float = 8.0, min_delay: float = 0.5, min_samples: int = 20):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+
+    def delay(self, latencies: LatencyTracker, model: str) -> float:
+        if latencies.count(model) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, latencies.percentile(model, self.percentile))
+
+    def record_fired(self) -> None:
+        with self._lock:
+            self.hedges_fired += 1
+
+    def record_won(self, latency_saved: float) -> None:
+        with self._lock:
+            self.hedges_won += 1
+            self.latency_saved += max(0.0, latency_saved)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won,
+                "latency_saved": round(self.latency_saved, 3)
+            }
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is refused because the model's circuit is open."""
+
+
+# Statuses that say the provider is struggling rather than that the request was wrong
+PROVIDER_ERROR_STATUSES = frozenset({408, 409, 429})
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """The HTTP status of a failed call, if the client reported one."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_provider_error(error: BaseException) -> bool:
+    """
+    Whether a failure says something about the model's health: 5xx, 429 and
+    timeouts do, and so do connection errors, which carry no status. Auth and
+    other 4xx errors are the caller's problem (a bad key, a bad request) and
+    must not open the circuit for everyone else.
+    """
+    status = error_status(error)
+    if status is None:
+        return True
+    return status >= 500 or status in PROVIDER_ERROR_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker. Closed: calls flow and outcomes are recorded in
+    a rolling window. Open: calls are refused until open_duration has passed.
+    Half-open: a limited number of probe calls decide whether to close again.
+    Slow calls count against the model like failures: short calls (and a
+    stream's time to first token) past slow_call_threshold, long document
+    drafts past slow_draft_threshold.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, slow_call_threshold: float = 30.0,
+                 slow_draft_threshold: float = 180.0, window: int = 20, min_calls: int = 5, open_duration: float = 30.0,
+                 half_open_probes: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_draft_threshold = slow_draft_threshold
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_duration:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        print(f"Circuit for {self.name} opened")
+
+    def is_available(self) -> bool:
+        """Whether a call would currently be allowed, without reserving it."""
+        with self._lock:
+            self._refresh()
+            if self._state == self.OPEN:
+                return False
+            if self._state == self.HALF_OPEN:
+                return self._probes_in_flight < self.half_open_probes
+            return True
+
+    def allow_request(self) -> bool:
+        """Reserve a call; in half-open state this takes one of the probe slots."""
+        with self._lock:
+            self._refresh()
+            if self._state == self.OPEN:
+                return False
+            if self._state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def release(self) -> None:
+        """Give back a reservation whose call was cancelled before it finished."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def record_success(self, elapsed: float, long_call: bool = False) -> None:
+        if elapsed > (self.slow_draft_threshold if long_call else self.slow_call_threshold):
+            self.record_failure()
+            return
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                print(f"Circuit for {self.name} closed")
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            if self._state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                failure_rate = self._outcomes.count(False) / len(self._outcomes)
+                if failure_rate >= self.failure_rate_threshold:
+                    self._trip()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._outcomes.clear()
+            self._probes_in_flight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            return {
+                "state": self._state,
+                "calls": len(self._outcomes),
+                "failures": self._outcomes.count(False)
+            }
+
+
+class CircuitBreakerRegistry:
+    """
+    One breaker per API key and model, shared by every agent and session in
+    the process. Keys are told apart by fingerprint, as in the health cache,
+    so one user's failing key never opens the circuit for another's.
+    """
+    def __init__(self, **breaker_options: Any):
+        self.breaker_options = breaker_options
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str, model: str) -> CircuitBreaker:
+        key = (fingerprint_api_key(api_key), model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker(f"{model} ({key[0]})", **self.breaker_options))
+        return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {breaker.name: breaker.stats() for breaker in list(self._breakers.values())}
+
+
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,82 @@
+"""
+Document Section Planning
+Splits a compiled document template into its preamble, numbered sections
+("1. DEFINITION OF ...") and closing signature block. The slices are exact,
+so rendering every section and joining them reproduces the full template.
+Each section knows its placeholders, which is what lets an edited answer
+re-render only the sections that use it.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+
+from template_engine import CompiledTemplate, TemplateError
+
+SECTION_HEADING = re.compile(r"^(\d+)\.[ \t]+([A-Z][A-Z ,&'/-]*)[ \t]*$", re.MULTILINE)
+CLOSING_HEADING = re.compile(r"^IN WITNESS WHEREOF", re.MULTILINE)
+
+
+class TemplateSection:
+    """One slice of a document template: the preamble, a numbered section or the closing."""
+    __slots__ = ("key", "number", "title", "template")
+
+    def __init__(self, key: str, number: int, title: str, template: CompiledTemplate):
+        self.key = key
+        self.number = number
+        self.title = title
+        self.template = template
+
+    @property
+    def placeholders(self) -> FrozenSet[str]:
+        return self.template.placeholders
+
+    @property
+    def is_numbered(self) -> bool:
+        return self.number > 0
+
+    def render(self, values: Dict[str, Any]) -> str:
+        return self.template.render(values)
+
+    def __repr__(self) -> str:
+        return f"TemplateSection({self.key!r}, {self.title!r})"
+
+
+def split_source(source: str) -> List[Tuple[str, int, str, str]]:
+    """(key, number, title, text) for each slice of a template source, in order."""
+    headings = list(SECTION_HEADING.finditer(source))
+    if not headings:
+        return [("preamble", 0, "", source)]
+    closing = CLOSING_HEADING.search(source, headings[-1].end())
+    body_end = closing.start() if closing else len(source)
+
+    slices = [("preamble", 0, "", source[:headings[0].start()])]
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else body_end
+        slices.append((heading.group(1), int(heading.group(1)), heading.group(2).strip(), source[heading.start():end]))
+    if closing:
+        slices.append(("closing", 0, "", source[body_end:]))
+    return slices
+
+
+@lru_cache(maxsize=64)
+def plan_sections(template: CompiledTemplate) -> Tuple[TemplateSection, ...]:
+    """Section plan for a template, computed once per compiled template."""
+    return tuple(
+        TemplateSection(key, number, title, CompiledTemplate(f"{template.name} {key}", text))
+        for key, number, title, text in split_source(template.source)
+    )
+
+
+def render_sections(template: CompiledTemplate, values: Dict[str, Any]) -> Dict[str, str]:
+    """Rendered text of every section, keyed and ordered like the plan."""
+    missing = template.missing_fields(values)
+    if missing:
+        raise TemplateError(f"Missing information for {template.name}: {', '.join(missing)}")
+    return {section.key: section.render(values) for section in plan_sections(template)}
+
+
+def affected_sections(template: CompiledTemplate, changed_fields: Iterable[str]) -> List[TemplateSection]:
+    """Sections whose text depends on any of the changed placeholders."""
+    changed = frozenset(changed_fields)
+    return [section for section in plan_sections(template) if section.placeholders & changed]
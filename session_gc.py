@@ -0,0 +1,84 @@
+"""
+Session Garbage Collection
+Removes stored sessions nobody will come back to:
+- empty sessions, with no document type, answers, history or document
+  (the old manager wrote one for every session it merely looked up), and
+- abandoned sessions, never completed and not updated for
+  abandoned_after_days days.
+Candidates are found with store queries (the session index or SQLite
+columns), so only sessions without a document type are ever loaded.
+
+Usage: python session_gc.py Experiments/session_data --abandoned-days 30 --dry-run
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from typing import AbstractSet, Any, Dict, Optional
+
+from session_store import SessionStore, open_session_store
+
+DEFAULT_ABANDONED_AFTER_DAYS = 30.0
+# A session is worth storing once any of these holds something
+MEANINGFUL_FIELDS = ("document_type", "collected_info", "conversation_history", "final_document", "is_complete")
+
+
+def is_empty_session(session_data: Dict[str, Any]) -> bool:
+    """Whether a session has nothing worth storing: no document type, answers, history or document."""
+    return not any(session_data.get(field) for field in MEANINGFUL_FIELDS)
+
+
+def collect_sessions(store: SessionStore, abandoned_after_days: Optional[float] = DEFAULT_ABANDONED_AFTER_DAYS,
+                     dry_run: bool = False, now: Optional[datetime] = None,
+                     keep: AbstractSet[str] = frozenset()) -> Dict[str, Any]:
+    """
+    Delete empty sessions and, unless abandoned_after_days is None,
+    abandoned ones. Returns what was removed (or would be, with dry_run).
+    Sessions in keep (changed in memory since they were stored) are spared.
+    """
+    empty = []
+    untyped = store.query(document_type="")
+    for session_id in untyped:
+        if session_id in keep:
+            continue
+        session_data = store.load(session_id)
+        if session_data is None or is_empty_session(session_data):
+            empty.append(session_id)
+    abandoned = []
+    if abandoned_after_days is not None:
+        cutoff = ((now or datetime.now()) - timedelta(days=abandoned_after_days)).isoformat()
+        removed = set(empty) | set(keep)
+        abandoned = [session_id for session_id in store.query(is_complete=False, updated_before=cutoff)
+                     if session_id not in removed]
+    if not dry_run:
+        for session_id in empty + abandoned:
+            store.delete(session_id)
+    return {
+        "checked": len(untyped),
+        "empty": empty,
+        "abandoned": abandoned,
+        "dry_run": dry_run
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Remove empty and abandoned sessions.")
+    parser.add_argument("store", help="Session directory or SQLite database (.db)")
+    parser.add_argument("--abandoned-days", type=float, default=DEFAULT_ABANDONED_AFTER_DAYS,
+                        help="Remove incomplete sessions not updated for this many days")
+    parser.add_argument("--keep-abandoned", action="store_true", help="Only remove empty sessions")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without deleting")
+    args = parser.parse_args()
+
+    store = open_session_store(args.store)
+    report = collect_sessions(store, None if args.keep_abandoned else args.abandoned_days, args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"{verb} {len(report['empty'])} empty sessions (of {report['checked']} without a document type) "
+          f"and {len(report['abandoned'])} abandoned sessions")
+    for kind in ("empty", "abandoned"):
+        for session_id in report[kind]:
+            print(f"  {kind}: {session_id}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Session Index
+Metadata of every session in a JsonSessionStore (document type, completion,
+creation and update times), held in memory and persisted as an append-only
+JSON-lines file. Listing, filtering and counting sessions are answered from
+it without touching the session directories.
+
+Each save appends one line per session and each delete a tombstone; the
+last line for an id wins. The file is rewritten compactly once it holds
+more than twice as many lines as there are sessions.
+
+Entries are kept sorted by last_updated (ties by id, as in SQLite) however
+they were saved, loaded or migrated: a save with the current time lands at
+the end, anything older is inserted in place. A page of the most recently
+updated sessions is read off the end without sorting, and a filtered page
+stops as soon as it is full or reaches updated_after.
+"""
+
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+INDEX_FILE = "index.jsonl"
+# Rewrite the index file once stale lines outnumber live ones by this much
+MIN_STALE_LINES = 1000
+INDEXED_FIELDS = ("document_type", "is_complete", "created_at", "last_updated")
+
+
+def index_entry(session_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "document_type": session_data.get("document_type", "") or "",
+        "is_complete": bool(session_data.get("is_complete", False)),
+        "created_at": session_data.get("created_at", "") or "",
+        "last_updated": session_data.get("last_updated", "") or ""
+    }
+
+
+class SessionIndex:
+    """{session_id: metadata} for one session directory."""
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # (last_updated, session_id) of every entry, ascending
+        self._order: List[Tuple[str, str]] = []
+        self._lines = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> None:
+        entries, lines = self.read()
+        with self._lock:
+            self.replace(entries)
+            self._lines = lines
+
+    def read(self) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """The entries in the index file and its line count; a torn last line from a crash is ignored."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        lines = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                lines += 1
+                if record.get("deleted"):
+                    entries.pop(record["id"], None)
+                else:
+                    entries[record["id"]] = {field: record.get(field) for field in INDEXED_FIELDS}
+        return entries, lines
+
+    def append(self, records: List[Dict[str, Any]]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self._lines += len(records)
+        if self._lines - len(self._entries) > max(len(self._entries), MIN_STALE_LINES):
+            self.rewrite()
+
+    def put(self, sessions: Dict[str, Dict[str, Any]]) -> None:
+        """Record the metadata of saved sessions, in one append."""
+        if not sessions:
+            return
+        entries = [(session_id, index_entry(session_data)) for session_id, session_data in sessions.items()]
+        with self._lock:
+            for session_id, entry in entries:
+                self.discard(session_id)
+                self._entries[session_id] = entry
+                insort(self._order, (entry["last_updated"], session_id))
+            self.append([{"id": session_id, **entry} for session_id, entry in entries])
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            if not self.discard(session_id):
+                return False
+            self.append([{"id": session_id, "deleted": True}])
+            return True
+
+    def discard(self, session_id: str) -> bool:
+        """Drop an entry from memory. Called with the lock held."""
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return False
+        del self._order[bisect_left(self._order, (entry["last_updated"], session_id))]
+        return True
+
+    def replace(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Swap in a whole set of entries. Called with the lock held."""
+        self._entries = entries
+        self._order = sorted((entry["last_updated"], session_id) for session_id, entry in entries.items())
+
+    def rewrite(self) -> None:
+        """
+        Replace the file with one line per live session. The file is replayed
+        first rather than trusting memory, so sessions saved or deleted by
+        another process using the same directory (session_gc.py against a
+        running app) survive the rewrite. Called with the lock held.
+        """
+        if self.path.exists():
+            self.replace(self.read()[0])
+        self.write()
+
+    def write(self) -> None:
+        """Write the entries in memory as the whole file. Called with the lock held."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for _, session_id in self._order:
+                entry = self._entries[session_id]
+                f.write(json.dumps({"id": session_id, **entry}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._lines = len(self._entries)
+
+    def rebuild(self, sessions: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        entries = {session_id: index_entry(session_data) for session_id, session_data in sessions}
+        with self._lock:
+            self.replace(entries)
+            self.write()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(session_id)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [session_id for _, session_id in self._order]
+
+    def newest_first(self, document_type: Optional[str], is_complete: Optional[bool],
+                     updated_after: Optional[str], updated_before: Optional[str] = None) -> Iterator[str]:
+        """Matching ids from the most recently updated back. Called with the lock held."""
+        end = len(self._order) if updated_before is None else bisect_left(self._order, (updated_before,))
+        for index in range(end - 1, -1, -1):
+            last_updated, session_id = self._order[index]
+            if updated_after is not None and last_updated <= updated_after:
+                # Everything further back is older still
+                return
+            entry = self._entries[session_id]
+            if document_type is not None and entry["document_type"] != document_type:
+                continue
+            if is_complete is not None and entry["is_complete"] != is_complete:
+                continue
+            yield session_id
+
+    def query(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None,
+              updated_after: Optional[str] = None, updated_before: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[str]:
+        """One page of matching ids, most recently updated first."""
+        with self._lock:
+            matches = self.newest_first(document_type, is_complete, updated_after, updated_before)
+            return list(islice(matches, offset, None if limit is None else offset + limit))
+
+    def count(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None) -> int:
+        with self._lock:
+            if document_type is None and is_complete is None:
+                return len(self._entries)
+            return sum(1 for _ in self.newest_first(document_type, is_complete, None))
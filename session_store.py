@@ -0,0 +1,479 @@
+"""
+Session Storage Backends
+Where SessionMemoryManager keeps sessions. JsonSessionStore keeps one file
+per session, sharded into subdirectories and listed from a session index
+(see session_index.py); SqliteSessionStore keeps every session in one
+SQLite database in WAL mode, with the fields sessions are looked up by
+(document_type, is_complete, last_updated) in indexed columns so they can be
+queried without loading any session.
+
+open_session_store() picks the backend from the location: a path ending in
+.db, .sqlite or .sqlite3 is a SQLite database, anything else a directory.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from session_index import INDEX_FILE, SessionIndex
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+class SessionStore(ABC):
+    """Interface of a session backend. Sessions are plain dicts keyed by session_id."""
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The stored session, or None when it doesn't exist or can't be read."""
+
+    @abstractmethod
+    def save_many(self, sessions: Dict[str, Dict[str, Any]]) -> None:
+        """Store a batch of sessions, replacing any stored versions."""
+
+    def save(self, session_id: str, session_data: Dict[str, Any]) -> None:
+        self.save_many({session_id: session_data})
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; False when it wasn't stored."""
+
+    @abstractmethod
+    def exists(self, session_id: str) -> bool:
+        """Whether the session is stored."""
+
+    @abstractmethod
+    def list_ids(self) -> List[str]:
+        """Ids of every stored session."""
+
+    @abstractmethod
+    def query(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None,
+              updated_after: Optional[str] = None, updated_before: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[str]:
+        """Ids of the matching sessions, most recently updated first. Timestamps are ISO strings."""
+
+    def count(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None) -> int:
+        return len(self.query(document_type, is_complete))
+
+    def iter_sessions(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Every stored session; used by migrations."""
+        for session_id in self.list_ids():
+            session_data = self.load(session_id)
+            if session_data is not None:
+                yield session_id, session_data
+
+    def close(self) -> None:
+        pass
+
+
+MISSING = object()
+
+
+def persisted_values(session_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Shallow copy of a session as written, to diff the next save against."""
+    return {key: list(value) if isinstance(value, list) else dict(value) if isinstance(value, dict) else value
+            for key, value in session_data.items()}
+
+
+def session_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What changed between two versions of a session: lists that only grew
+    (conversation_history) as "append", everything else as "set" or "unset".
+    Empty when nothing changed.
+    """
+    delta: Dict[str, Any] = {}
+    for key, value in new.items():
+        previous = old.get(key, MISSING)
+        if previous is MISSING or previous != value:
+            if isinstance(value, list) and isinstance(previous, list) and value[:len(previous)] == previous:
+                delta.setdefault("append", {})[key] = value[len(previous):]
+            else:
+                delta.setdefault("set", {})[key] = value
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta["unset"] = removed
+    return delta
+
+
+def apply_delta(session_data: Dict[str, Any], delta: Dict[str, Any]) -> None:
+    session_data.update(delta.get("set", {}))
+    for key, items in delta.get("append", {}).items():
+        session_data.setdefault(key, []).extend(items)
+    for key in delta.get("unset", ()):
+        session_data.pop(key, None)
+
+
+# A journal is folded into its snapshot after this many deltas...
+DEFAULT_COMPACT_EVERY = 50
+# ...and a session is diffed against at most this many remembered versions
+MAX_JOURNALED_SESSIONS = 4096
+# Hex digits of the session id's hash naming its subdirectory: 2 gives 256 shards
+SHARD_PREFIX_LENGTH = 2
+
+
+class JsonSessionStore(SessionStore):
+    """
+    One pretty-printed JSON file per session, in a subdirectory named by the
+    first SHARD_PREFIX_LENGTH hex digits of the id's SHA-1 so no directory
+    grows too large. Listing, filtering and existence checks go to the
+    session index instead of the file system. Files from the old flat layout
+    are moved into their shards when the store is opened, and the index is
+    rebuilt on first use if any were.
+
+    With journal on, a save after the first only appends the session's
+    changes as one JSON line to session_<id>.log, so its cost doesn't grow
+    with the session; the log is compacted into the snapshot every
+    compact_every deltas. Loading
+    replays the log over the snapshot. Each delta carries a sequence number
+    and the snapshot records the last one it contains, so a crash between
+    writing a snapshot and truncating the log never applies a delta twice.
+    """
+    def __init__(self, storage_dir: str, journal: bool = True, compact_every: int = DEFAULT_COMPACT_EVERY):
+        super().__init__()
+        self.storage_dir = Path(storage_dir)
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.journal = journal
+        self.compact_every = compact_every
+        # session_id -> (values as last written, last sequence number, deltas in the log)
+        self._journaled: "OrderedDict[str, Tuple[Dict[str, Any], int, int]]" = OrderedDict()
+        self.bytes_written = 0
+        self.compactions = 0
+        self._index = SessionIndex(self.storage_dir / INDEX_FILE)
+        self._index_loaded = False
+        self._index_lock = threading.Lock()
+        # Shard directories known to exist, to skip a mkdir per write
+        self._shards: Set[Path] = set()
+        # Before anything is loaded or saved, so no session is read from (or written over) the wrong place
+        self._index_stale = self.move_flat_files() > 0
+
+    @property
+    def index(self) -> SessionIndex:
+        """The session index, loaded (or built from the files) on first use so opening a store stays cheap."""
+        if not self._index_loaded:
+            with self._index_lock:
+                if not self._index_loaded:
+                    if self._index.exists() and not self._index_stale:
+                        self._index.load()
+                    else:
+                        self.reindex()
+                    self._index_loaded = True
+        return self._index
+
+    def shard_for(self, session_id: str) -> Path:
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        return self.storage_dir / digest[:SHARD_PREFIX_LENGTH]
+
+    def path_for(self, session_id: str) -> Path:
+        return self.shard_for(session_id) / f"session_{session_id}.json"
+
+    def log_path_for(self, session_id: str) -> Path:
+        return self.shard_for(session_id) / f"session_{session_id}.log"
+
+    def move_flat_files(self) -> int:
+        """Move session files of the old flat layout into their shards. Returns how many were moved."""
+        moved = 0
+        for path in list(self.storage_dir.glob("session_*.json")) + list(self.storage_dir.glob("session_*.log")):
+            session_id = path.stem.replace("session_", "", 1)
+            target = self.shard_for(session_id) / path.name
+            target.parent.mkdir(exist_ok=True)
+            os.replace(path, target)
+            moved += 1
+        return moved
+
+    def reindex(self) -> int:
+        """
+        Move any files of the flat layout into their shards and rebuild the
+        index from the session files. Returns how many sessions were indexed.
+        """
+        self.move_flat_files()
+        self._index_stale = False
+        session_ids = [path.stem.replace("session_", "", 1) for path in self.storage_dir.glob("*/session_*.json")]
+        self._index.rebuild(
+            (session_id, session_data) for session_id in session_ids
+            if (session_data := self.load(session_id)) is not None
+        )
+        return len(self._index)
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path_for(session_id), 'r', encoding='utf-8') as f:
+                self.reads += 1
+                session_data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A corrupt file is replaced by a fresh session, as before
+            return None
+        sequence = session_data.pop("journal_sequence", 0)
+        deltas = 0
+        if self.journal:
+            sequence, deltas = self.replay_log(session_id, session_data, sequence)
+            self.remember(session_id, session_data, sequence, deltas)
+        return session_data
+
+    def replay_log(self, session_id: str, session_data: Dict[str, Any], sequence: int) -> Tuple[int, int]:
+        """Apply the logged deltas newer than the snapshot; a torn last line from a crash is ignored."""
+        deltas = 0
+        try:
+            with open(self.log_path_for(session_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if entry["sequence"] > sequence:
+                        apply_delta(session_data, entry["delta"])
+                        sequence = entry["sequence"]
+                        deltas += 1
+        except FileNotFoundError:
+            pass
+        return sequence, deltas
+
+    def remember(self, session_id: str, session_data: Dict[str, Any], sequence: int, deltas: int) -> None:
+        self._journaled[session_id] = (persisted_values(session_data), sequence, deltas)
+        self._journaled.move_to_end(session_id)
+        while len(self._journaled) > MAX_JOURNALED_SESSIONS:
+            # A forgotten session is simply compacted on its next save
+            self._journaled.popitem(last=False)
+
+    def save_many(self, sessions: Dict[str, Dict[str, Any]]) -> None:
+        saved = {}
+        for session_id, session_data in sessions.items():
+            journaled = self._journaled.get(session_id) if self.journal else None
+            if journaled is None or journaled[2] >= self.compact_every:
+                # The snapshot's sequence must cover everything already logged, or a replay could apply it again.
+                # A session the index doesn't know yet has no log to cover.
+                stored = self.journal and session_id in self.index
+                sequence = journaled[1] if journaled else self.last_logged_sequence(session_id) if stored else 0
+                self.write_snapshot(session_id, session_data, sequence, has_log=stored)
+                saved[session_id] = session_data
+                continue
+            values, sequence, deltas = journaled
+            delta = session_delta(values, session_data)
+            if delta:
+                saved[session_id] = session_data
+                line = json.dumps({"sequence": sequence + 1, "delta": delta}, ensure_ascii=False) + "\n"
+                with open(self.log_path_for(session_id), 'a', encoding='utf-8') as f:
+                    f.write(line)
+                self.bytes_written += len(line.encode("utf-8"))
+                self.writes += 1
+                self.remember(session_id, session_data, sequence + 1, deltas + 1)
+        self.index.put(saved)
+
+    def write_snapshot(self, session_id: str, session_data: Dict[str, Any], sequence: int, has_log: bool = True) -> None:
+        # Write to a temp file first so readers never see a partial session
+        path = self.path_for(session_id)
+        if path.parent not in self._shards:
+            path.parent.mkdir(exist_ok=True)
+            self._shards.add(path.parent)
+        tmp_path = path.with_suffix(".tmp")
+        snapshot = dict(session_data, journal_sequence=sequence) if self.journal else session_data
+        text = json.dumps(snapshot, indent=2, ensure_ascii=False)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        self.bytes_written += len(text.encode("utf-8"))
+        self.writes += 1
+        if self.journal:
+            # Every logged delta is in the snapshot now
+            if has_log:
+                self.log_path_for(session_id).unlink(missing_ok=True)
+            self.compactions += 1
+            self.remember(session_id, session_data, sequence, 0)
+
+    def last_logged_sequence(self, session_id: str) -> int:
+        """Highest sequence number in a session's log, for sessions no longer remembered."""
+        sequence = 0
+        try:
+            with open(self.log_path_for(session_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        sequence = max(sequence, json.loads(line)["sequence"])
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return sequence
+
+    def compact(self, session_id: str) -> bool:
+        """Fold a session's log into its snapshot now rather than at the next threshold."""
+        if not self.journal or not self.log_path_for(session_id).exists():
+            return False
+        session_data = self.load(session_id)
+        if session_data is None:
+            return False
+        self.write_snapshot(session_id, session_data, self._journaled[session_id][1])
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        self._journaled.pop(session_id, None)
+        self.index.remove(session_id)
+        self.log_path_for(session_id).unlink(missing_ok=True)
+        path = self.path_for(session_id)
+        if path.exists():
+            os.remove(path)
+            return True
+        return False
+
+    def exists(self, session_id: str) -> bool:
+        return session_id in self.index
+
+    def list_ids(self) -> List[str]:
+        return self.index.ids()
+
+    def query(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None,
+              updated_after: Optional[str] = None, updated_before: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[str]:
+        return self.index.query(document_type, is_complete, updated_after, updated_before, limit, offset)
+
+    def count(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None) -> int:
+        return self.index.count(document_type, is_complete)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    All sessions in one SQLite database in WAL mode, so readers never block
+    the writer. The full session is stored as JSON next to indexed copies of
+    the columns queries filter and sort on.
+    """
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            document_type TEXT NOT NULL DEFAULT '',
+            is_complete INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT '',
+            last_updated TEXT NOT NULL DEFAULT '',
+            data TEXT NOT NULL
+        )""",
+        # Each filter column leads an index ending in last_updated, so filtered listings come back already sorted
+        "CREATE INDEX IF NOT EXISTS idx_sessions_document_type ON sessions (document_type, last_updated)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_is_complete ON sessions (is_complete, last_updated)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_last_updated ON sessions (last_updated)"
+    )
+    UPSERT = (
+        "INSERT INTO sessions (session_id, document_type, is_complete, created_at, last_updated, data) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET document_type = excluded.document_type, "
+        "is_complete = excluded.is_complete, created_at = excluded.created_at, "
+        "last_updated = excluded.last_updated, data = excluded.data"
+    )
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the request threads and the flush thread, serialized by the lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode NORMAL only risks the last transactions on power loss, never corruption
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+
+    @staticmethod
+    def row_for(session_id: str, session_data: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (
+            session_id,
+            session_data.get("document_type", "") or "",
+            int(bool(session_data.get("is_complete", False))),
+            session_data.get("created_at", "") or "",
+            session_data.get("last_updated", "") or "",
+            json.dumps(session_data, ensure_ascii=False)
+        )
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        self.reads += 1
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def save_many(self, sessions: Dict[str, Dict[str, Any]]) -> None:
+        if not sessions:
+            return
+        rows = [self.row_for(session_id, session_data) for session_id, session_data in sessions.items()]
+        with self._lock:
+            # One transaction per batch, however many sessions it holds
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(self.UPSERT, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.writes += len(rows)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+    def list_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT session_id FROM sessions")]
+
+    def count(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None) -> int:
+        where, params = self.filters(document_type, is_complete, None)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM sessions{where}", params).fetchone()[0]
+
+    @staticmethod
+    def filters(document_type: Optional[str], is_complete: Optional[bool], updated_after: Optional[str],
+                updated_before: Optional[str] = None) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if document_type is not None:
+            clauses.append("document_type = ?")
+            params.append(document_type)
+        if is_complete is not None:
+            clauses.append("is_complete = ?")
+            params.append(int(is_complete))
+        if updated_after is not None:
+            clauses.append("last_updated > ?")
+            params.append(updated_after)
+        if updated_before is not None:
+            clauses.append("last_updated < ?")
+            params.append(updated_before)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, document_type: Optional[str] = None, is_complete: Optional[bool] = None,
+              updated_after: Optional[str] = None, updated_before: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[str]:
+        where, params = self.filters(document_type, is_complete, updated_after, updated_before)
+        sql = f"SELECT session_id FROM sessions{where} ORDER BY last_updated DESC, session_id DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params + [-1 if limit is None else limit, offset])]
+
+    def iter_sessions(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT session_id, data FROM sessions").fetchall()
+        for session_id, data in rows:
+            yield session_id, json.loads(data)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_session_store(location: str) -> SessionStore:
+    """SQLite for a .db/.sqlite/.sqlite3 path, a JSON file directory for anything else."""
+    if Path(location).suffix.lower() in SQLITE_SUFFIXES:
+        return SqliteSessionStore(location)
+    return JsonSessionStore(location)
@@ -0,0 +1,65 @@
+"""
+Compiled Document Templates
+Parses a str.format-style template once into a list of literal/placeholder
+segments so rendering is a single pass of list appends and one join, and
+missing fields are reported up front instead of as a bare KeyError.
+"""
+
+from string import Formatter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# (literal text, field name or None, conversion or None, format spec)
+Segment = Tuple[str, Optional[str], Optional[str], str]
+
+
+class TemplateError(ValueError):
+    """Raised when a template can't be compiled or rendered."""
+
+
+class CompiledTemplate:
+    """A document template pre-parsed into segments."""
+    __slots__ = ("name", "source", "segments", "placeholders")
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        try:
+            parsed = list(Formatter().parse(source))
+        except ValueError as e:
+            raise TemplateError(f"Invalid template {name}: {e}") from e
+        segments: List[Segment] = []
+        for literal, field, spec, conversion in parsed:
+            if field is not None and (not field.isidentifier()):
+                raise TemplateError(f"Template {name} uses an unsupported placeholder: {{{field}}}")
+            segments.append((literal, field, conversion, spec or ""))
+        self.segments = tuple(segments)
+        self.placeholders: FrozenSet[str] = frozenset(seg[1] for seg in segments if seg[1])
+
+    def missing_fields(self, values: Dict[str, Any]) -> List[str]:
+        return sorted(field for field in self.placeholders if field not in values)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        parts = []
+        append = parts.append
+        try:
+            for literal, field, conversion, spec in self.segments:
+                append(literal)
+                if field is None:
+                    continue
+                value = values[field]
+                if conversion == "r":
+                    value = repr(value)
+                elif conversion == "a":
+                    value = ascii(value)
+                append(format(value, spec) if spec or not isinstance(value, str) else value)
+        except KeyError:
+            raise TemplateError(f"Missing information for {self.name}: {', '.join(self.missing_fields(values))}") from None
+        return "".join(parts)
+
+    def render_many(self, values_list: Iterable[Dict[str, Any]]) -> List[str]:
+        """Render the template once per set of values, for bulk drafting."""
+        render = self.render
+        return [render(values) for values in values_list]
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate({self.name!r}, placeholders={sorted(self.placeholders)})"
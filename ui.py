@@ -2,7 +2,7 @@ import streamlit as st
 import os
 import uuid
 from datetime import datetime
-from graph import LegalDocumentAgent, AgentState
+from graph import LegalDocumentAgent, AgentState, document_source, strip_document_marker
 
 st.set_page_config(page_title="Legal Document Drafting", layout="centered")
 
@@ -66,7 +66,7 @@ def api_key_form():
     if api_key:
         os.environ["OPENROUTER_API_KEY"] = api_key
         st.session_state.api_key = api_key
-        st.session_state.agent = LegalDocumentAgent()
+        st.session_state.agent = LegalDocumentAgent(api_key=api_key, health_check="background")
         st.session_state.agent_initialized = True
         st.success("API key set and agent initialized!")
         st.rerun()
@@ -86,6 +86,13 @@ if "input_counter" not in st.session_state:
     st.session_state.input_counter = 0
 
 agent = st.session_state.agent
+agent.generation_mode = st.radio(
+    "Generation mode:",
+    options=["llm", "sections", "hybrid", "template"],
+    format_func=lambda mode: {"llm": "LLM", "sections": "LLM by section", "hybrid": "Hybrid", "template": "Template (instant)"}[mode],
+    horizontal=True,
+    key="generation_mode"
+)
 
 def reset_session():
     st.session_state.session_id = str(uuid.uuid4())
@@ -131,7 +138,12 @@ if st.session_state.chat_history:
             st.session_state.state_dict = agent.process_answer(st.session_state.state_dict)
             # If now complete, generate and show document
             if st.session_state.state_dict.get("is_complete", False):
-                st.session_state.state_dict = agent.generate_document(st.session_state.state_dict)
+                # Render the document progressively as the LLM streams it
+                stream_placeholder = st.empty()
+                streamed = ""
+                for chunk in agent.stream_document(st.session_state.state_dict):
+                    streamed += chunk
+                    stream_placeholder.code(streamed)
                 document = st.session_state.state_dict.get("final_document", "[No document generated]")
                 st.session_state.chat_history.append({"role": "ai", "content": "---\n**Generated Legal Document**\n" + document})
             else:
@@ -147,9 +159,10 @@ if st.session_state.chat_history:
         st.markdown("---")
         if error_message:
             st.markdown(f'<div class="warning-box"><b>Error:</b> {error_message}</div>', unsafe_allow_html=True)
-        elif "[Generated by LLM" in document:
-            st.markdown('<div class="section-card info-box"><b>✅ LLM-Generated Legal Document</b></div>', unsafe_allow_html=True)
-            clean_doc = document.replace("\n\n[Generated by LLM (OpenRouter DeepSeek)]", "").strip()
+        elif document_source(document) == "llm" or (document_source(document) and agent.generation_mode != "llm"):
+            source = {"llm": "LLM", "sections": "LLM by section", "hybrid": "Hybrid", "template": "Template"}[document_source(document)]
+            st.markdown(f'<div class="section-card info-box"><b>✅ {source}-Generated Legal Document</b></div>', unsafe_allow_html=True)
+            clean_doc = strip_document_marker(document)
             st.code(clean_doc)
             st.download_button(
                 label="Download Document as TXT",